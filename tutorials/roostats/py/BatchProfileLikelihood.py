@@ -16,6 +16,8 @@ __version__ = "0.1"
 
 
 import helperModifyModelConfig
+import helperScanPoints
+import helperSeeds
 
 
 import optparse
@@ -23,12 +25,30 @@ parser = optparse.OptionParser(version="0.1")
 parser.add_option("-o", "--output", help="output location", type="string", dest="output", default="batchOutput/")
 
 helperModifyModelConfig.addOptionsToOptParse( parser )
+helperSeeds.addOptionsToOptParse( parser )
 parser.add_option("-c", "--counter", help="Number of this job.", dest="counter", type="int", default=1)
 parser.add_option("-j", "--jobs", help="Number of jobs.", dest="jobs", type="int", default=1)
+parser.add_option(      "--workers", help="Number of local worker processes for the conditional fits of this job. The model is loaded once and forked into the workers.", dest="workers", type="int", default=1)
+
+parser.add_option(      "--queue", help="SQLite file of a work queue shared by all jobs. Instead of a fixed slice of the grid, every job claims points from the queue until it is empty.", dest="queue", default=None )
+parser.add_option(      "--leaseTime", help="Seconds after which a claimed but unfinished point of the work queue is handed out again.", dest="leaseTime", type="float", default=3600.0)
 
 parser.add_option("-f", "--fullRun", help="Do a full run.", dest="fullRun", default=False, action="store_true")
 parser.add_option(      "--unconditionalFitInSeparateJob", help="Do the unconditional fit in a separate job", dest="unconditionalFitInSeparateJob", default=False, action="store_true")
+parser.add_option(      "--fitCache", help="Directory of the cache for the unconditional fit. The first job does the fit and all other jobs with the same workspace and model options reuse it.", dest="fitCache", default=None )
+parser.add_option(      "--points", help="Scan the points in this file instead of the grid. One point per line, either as \"mu=1.0, mH=125\" or as values in the order of the POIs.", dest="points", default=None )
+parser.add_option(      "--design", help="Scan a generated design instead of the grid: lhs:n[:seed] (Latin hypercube), sobol:n (Sobol sequence) or smolyak:level (sparse grid).", dest="design", default=None )
+parser.add_option(      "--scanOrder", help="Order in which the grid points are visited and split into jobs: grid (default), snake or hilbert. With snake and hilbert, consecutive points are neighbours. Lists of points are sorted along a Hilbert curve for both.", dest="scanOrder", type="choice", choices=helperScanPoints.scanOrders, default="grid")
+parser.add_option(      "--warmStart", help="Start every conditional fit from the nuisance parameters of the nearest point that already converged.", dest="warmStart", default=False, action="store_true")
+parser.add_option(      "--adaptive", help="Adaptive scan: start from the grid given by the POI bins and refine only the cells that are crossed by one of these comma separated NLL-minNLL levels. Example: \"0.5,2.0\".", dest="adaptive", default=None )
+parser.add_option(      "--adaptiveDepth", help="Number of refinement steps of the adaptive scan. Every step halves the cell size.", dest="adaptiveDepth", type="int", default=3)
+parser.add_option(      "--strategyRegions", help="Remember which minimizer configuration converged in each of this many regions per POI and start the next fit in the region with it. Use 0 to always start with the default configuration.", dest="strategyRegions", type="int", default=5)
+parser.add_option(      "--hopelessEdm", help="Do not retry a failed fit when its EDM is above this value (or the NLL is NaN).", dest="hopelessEdm", type="float", default=1e4)
+parser.add_option(      "--retryPasses", help="Number of additional passes over the failed points of this job, starting from randomized nuisance parameters.", dest="retryPasses", type="int", default=1)
 parser.add_option(      "--initVars", help="Set these vars to these values before every fit (to work-around minuit getting stuck in local minima). It takes comma separated inputs of the form var=4.0 or var=4.0+/-1.0 .", dest="initVars", default=None )
+parser.add_option(      "--resultTree", help="Also write the results to a TTree in <output>/profileLikelihood_<counter>.root .", dest="resultTree", default=False, action="store_true")
+parser.add_option(      "--journal", help="Write every finished point to the journal <output>/journal_<counter>.jsonl, so that an interrupted job can be resumed.", dest="journal", default=False, action="store_true")
+parser.add_option(      "--resume", help="Resume from the journal of an interrupted job: points in the journal are not fitted again. Implies --journal.", dest="resume", default=False, action="store_true")
 parser.add_option(      "--printAllNuisanceParameters", help="Prints all nuisance parameters.", dest="printAllNuisanceParameters", default=False, action="store_true")
 
 parser.add_option("-q", "--quiet", dest="verbose", action="store_false", default=True, help="Quiet output.")
@@ -37,12 +57,19 @@ options,args = parser.parse_args()
 # to calculate unconditionalFitInSeparateJob, reduce options.jobs by one to make room for the extra job
 if options.unconditionalFitInSeparateJob: options.jobs -= 1
 
+# resuming reads and continues the journal
+if options.resume: options.journal = True
+
 
 import ROOT
 import helperStyle
 
 import PyROOTUtils
-import math
+import helperProfileTree
+import helperWorkQueue
+import helperFitReport
+import helperFitCache
+import math, sys, os, time, json, threading, random
 from array import array
 
 
@@ -68,7 +95,7 @@ def jobBins( numPoints ):
       int(math.ceil(float(options.counter+1.0)*numPoints/options.jobs))
    )
 
-def visualizeEnumeration( poiL ):
+def visualizeEnumeration( poiL, scanPath ):
    if poiL.getSize() != 2:
       print( "ERROR: This is a 2D test." )
       return
@@ -87,13 +114,13 @@ def visualizeEnumeration( poiL ):
    )
 
    numPoints = reduce( lambda x,y: x*y, [poiL.at(d).getBins() for d in range(poiL.getSize())] )
-   for i in range( poiL.at(0).getBins()*poiL.at(1).getBins() ):
+   for pos,i in enumerate( scanPath ):
       parametersNCube( poiL, i )
-      numbers.SetBinContent( numbers.FindBin( poiL.at(0).getVal(), poiL.at(1).getVal() ), i )
-      jobs.SetBinContent( jobs.FindBin( poiL.at(0).getVal(), poiL.at(1).getVal() ), int(float(i)/numPoints*options.jobs) )
+      numbers.SetBinContent( numbers.FindBin( poiL.at(0).getVal(), poiL.at(1).getVal() ), pos )
+      jobs.SetBinContent( jobs.FindBin( poiL.at(0).getVal(), poiL.at(1).getVal() ), int(float(pos)/numPoints*options.jobs) )
 
    firstPoint,lastPoint = jobBins( numPoints )
-   for i in range( firstPoint,lastPoint ):
+   for i in scanPath[firstPoint:lastPoint]:
       parametersNCube( poiL, i )
       jobsMask.SetBinContent(
          jobsMask.FindBin( poiL.at(0).getVal(), poiL.at(1).getVal() ),
@@ -119,9 +146,44 @@ def visualizeEnumeration( poiL ):
 
 
 
-def minimize( nll ):
+def cpuTime():
+   t = os.times()
+   return t[0]+t[1]
+
+# default eps of RooMinimizer
+defaultEps = 1.0
+
+def minimizerConfigs():
+   """ Minimizer configurations (type,algorithm,strategy,eps) in the order
+   they are tried when a fit fails. An eps of None keeps the default of
+   RooMinimizer. Only the looser configuration changes it. """
+   mType = ROOT.Math.MinimizerOptions.DefaultMinimizerType()
+   algo = ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo()
+   configs = [ (mType,algo,strat,None) for strat in range( ROOT.Math.MinimizerOptions.DefaultStrategy(), 3 ) ]
+   configs.append( (mType,algo,2,10.0*defaultEps) )
+   configs.append( ("Minuit","Migrad",2,None) )
+   return configs
+
+def isHopeless( nll, edm ):
+   """ A failed fit with a NaN NLL or a huge EDM will not converge with a
+   different configuration either. """
+   v = nll.getVal()
+   return math.isnan(v) or math.isinf(v) or math.isnan(edm) or edm > options.hopelessEdm
+
+def minimize( nll, startConfig=0, keepFitResult=False ):
+   """ Tries the configurations from minimizerConfigs(), beginning with
+   startConfig, until the fit converges or looks hopeless. Every failed
+   fit moves on to the next configuration.
+
+   Returns a dictionary with the fit status and the instrumentation of
+   the fit: retries, configuration and strategy of the last fit, EDM,
+   number of NLL evaluations, number of evaluation errors, wall and CPU
+   time. With keepFitResult, the RooFitResult is returned as well. """
+   startTime,startCpuTime = (time.time(),cpuTime())
+   ROOT.RooAbsReal.clearEvalErrorLog()
    
-   strat = ROOT.Math.MinimizerOptions.DefaultStrategy()
+   configs = minimizerConfigs()
+   config = min( startConfig, len(configs)-1 )
 
    msglevel = ROOT.RooMsgService.instance().globalKillBelow()
    if not options.verbose:
@@ -132,7 +194,6 @@ def minimize( nll ):
       minim.setPrintLevel(-1)
    else:
       minim.setPrintLevel(1)
-   minim.setStrategy(strat)
    minim.optimizeConst(0)
 
    # Got to be very careful with SCAN. We have to allow for negative mu,
@@ -141,30 +202,78 @@ def minimize( nll ):
    #minim.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(), "Scan")
    
    status = -1
-   for i in range( 3 ):
-      status = minim.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(), 
-                              ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo())
+   attempts = 0
+   for config in range( config, min( len(configs), config+5 ) ):
+      mType,algo,strat,eps = configs[config]
+      if attempts > 0:
+         print( "Retrying with %s/%s, strat %d, eps %s" % (mType,algo,strat,str(eps) if eps else "default") )
+      minim.setStrategy(strat)
+      minim.setEps(eps if eps else defaultEps)
+      status = minim.minimize( mType, algo )
+      attempts += 1
+
+      fitResult = minim.save()
+      ROOT.SetOwnership( fitResult, True )
       if status == 0: break
 
-      if status != 0  and  status != 1  and  strat <= 1:
-         strat += 1
-         print( "Retrying with strat "+str(strat) )
-         minim.setStrategy(strat)
-         status = minim.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(), 
-                                 ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo())
-      
-      if status != 0  and  status != 1  and  strat <= 1:
-         strat += 1
-         print( "Retrying with strat "+str(strat) )
-         minim.setStrategy(strat)
-         status = minim.minimize(ROOT.Math.MinimizerOptions.DefaultMinimizerType(), 
-                                 ROOT.Math.MinimizerOptions.DefaultMinimizerAlgo())
+      if isHopeless( nll, fitResult.edm() ):
+         print( "Fit is hopeless (nll=%g, edm=%g). Not retrying." % (nll.getVal(),fitResult.edm()) )
+         break
       
    if status != 0 and status != 1:
       print( "ERROR::Minimization failed!" )
 
+   fit = {
+      'status': status,
+      'retries': attempts-1,
+      'config': config,
+      'strategy': configs[config][2],
+      'edm': fitResult.edm(),
+      'calls': minim.evalCounter(),
+      'evalErrors': ROOT.RooAbsReal.numEvalErrors(),
+      'time': time.time()-startTime,
+      'cpuTime': cpuTime()-startCpuTime,
+   }
+
    ROOT.RooMsgService.instance().setGlobalKillBelow(msglevel)
-   return nll.getVal()
+   if keepFitResult: return (fit,fitResult)
+   return fit
+
+
+
+class StrategyManager:
+   """ Remembers for every region of the POI space which configuration of
+   minimizerConfigs() was needed to converge and starts the next fit in
+   that region with it. After stepDown fits that converged without
+   escalating further, the region steps back to the next cheaper
+   one, so that a single hard point does not make the whole region
+   expensive. The regions divide every POI range into equal parts. """
+
+   def __init__( self, poiL, regions, stepDown=3 ):
+      self.ranges = [ (poiL.at(p).getMin(), poiL.at(p).getMax()) for p in range(poiL.getSize()) ]
+      self.regions = regions
+      self.stepDown = stepDown
+      # region -> [config,successes]
+      self.memory = {}
+
+   def region( self, pois ):
+      return tuple( [
+         min( self.regions-1, max( 0, int( (v-low)/(high-low)*self.regions ) ) )
+         for v,(low,high) in zip( pois, self.ranges )
+      ] )
+
+   def startConfig( self, pois ):
+      return self.memory.get( self.region( pois ), [0,0] )[0]
+
+   def update( self, pois, fit ):
+      if fit['status'] not in (0,1): return
+      m = self.memory.setdefault( self.region( pois ), [0,0] )
+      if fit['config'] > m[0]:
+         m[0],m[1] = (fit['config'],0)
+         return
+      m[1] += 1
+      if m[1] >= self.stepDown and m[0] > 0:
+         m[0],m[1] = (m[0]-1,0)
 
 
 
@@ -187,8 +296,301 @@ def preFit( w, mc, nll ):
 
 
 
+class WarmStartCache:
+   """ Remembers the nuisance parameter values of converged fits and returns
+   the ones from the nearest point. Points are hashed into the cells of the
+   POI grid, so only the cell of a point and its direct neighbours are
+   searched. """
+
+   def __init__( self, poiL ):
+      self.ranges = [ (poiL.at(p).getMin(), poiL.at(p).getMax(), poiL.at(p).getBins()) for p in range(poiL.getSize()) ]
+      self.cells = {}
+      self.last = None
+      
+      self.offsets = [()]
+      for d in range( len(self.ranges) ):
+         self.offsets = [ o+(s,) for o in self.offsets for s in (0,-1,1) ]
+
+   def normalized( self, pois ):
+      return [ (v-r[0])/(r[1]-r[0])*r[2] for v,r in zip(pois,self.ranges) ]
+
+   def store( self, pois, nuis ):
+      x = self.normalized( pois )
+      cell = tuple( [ int(math.floor(c)) for c in x ] )
+      self.cells.setdefault( cell, [] ).append( (x,nuis) )
+      self.last = nuis
+
+   def nearest( self, pois ):
+      """ Returns the nuisance parameter values of the nearest converged point
+      or of the last converged point if there is none in the neighbourhood. """
+      x = self.normalized( pois )
+      cell = [ int(math.floor(c)) for c in x ]
+      best,bestDist = (None,None)
+      for o in self.offsets:
+         for y,nuis in self.cells.get( tuple([c+oo for c,oo in zip(cell,o)]), [] ):
+            dist = sum( [(a-b)**2 for a,b in zip(x,y)] )
+            if bestDist is None or dist < bestDist: best,bestDist = (nuis,dist)
+      if best is None: return self.last
+      return best
+
+
+
+
+# (w,mc,nll,poiL,nuisL) for conditionalFit(); set in main() before the
+# worker processes are forked
+fitContext = None
+# WarmStartCache if --warmStart is used
+warmStartCache = None
+# list of POI value tuples if --points or --design is used
+scanPoints = None
+# StrategyManager unless --strategyRegions=0
+strategyManager = None
+
+def setPoint( poiL, i ):
+   """ Sets the POIs to point i of the list of scan points or, if there is
+   no list, to grid point i. """
+   if scanPoints is None:
+      parametersNCube( poiL, i )
+   else:
+      for p,v in enumerate( scanPoints[i] ): poiL.at(p).setVal( v )
+
+def randomizeNuisances( nuisL, seed ):
+   """ Moves the floating nuisance parameters to random values around their
+   current values. The width is the parameter error or, if there is none,
+   a tenth of the range (at most 1). """
+   rng = random.Random( seed )
+   for p in range( nuisL.getSize() ):
+      par = nuisL.at(p)
+      if par.isConstant(): continue
+      width = par.getError()
+      if not 0.0 < width < 1e10: width = min( 1.0, 0.1*(par.getMax()-par.getMin()) )
+      par.setVal( min( par.getMax(), max( par.getMin(), par.getVal()+rng.gauss(0.0,width) ) ) )
+
+def conditionalFit( i, retryPass=0 ):
+   """ Fit at point i with the POIs held constant. This runs inside
+   the worker processes when --workers is used. Returns a dictionary
+   with the fit result.
+
+   In a retry pass, the nuisance parameters are randomized before the fit
+   with a seed that depends on the campaign seed, the point and the pass. """
+   w,mc,nll,poiL,nuisL = fitContext
+
+   setPoint( poiL, i )
+   pois = [ poiL.at(p).getVal() for p in range(poiL.getSize()) ]
+   print( "" )
+   print( "--- next point: "+str(i)+" ---" )
+   print( "Parameters Of Interest: "+str(pois) )
+   if warmStartCache:
+      seed = warmStartCache.nearest( pois )
+      if seed:
+         for p,v in enumerate( seed ): nuisL.at(p).setVal( v )
+   if retryPass:
+      print( "Retry pass "+str(retryPass)+" with randomized nuisance parameters." )
+      randomizeNuisances( nuisL, helperSeeds.streamSeed( options.seed, "retry", i, retryPass ) )
+   preFit( w, mc, nll )
+   startConfig = 0
+   if strategyManager: startConfig = strategyManager.startConfig( pois )
+   fit = minimize( nll, startConfig )
+   if strategyManager: strategyManager.update( pois, fit )
+   if warmStartCache and fit['status'] in (0,1):
+      warmStartCache.store( pois, [ nuisL.at(p).getVal() for p in range(nuisL.getSize()) ] )
+   sys.stdout.flush()
+
+   return fitRecord( i, nll, poiL, nuisL, fit )
+
+def fitRecord( i, nll, poiL, nuisL, fit ):
+   """ Result dictionary for the current parameter values. """
+   r = {
+      'index': i,
+      'nll': nll.getVal(),
+      'pois': [ poiL.at(p).getVal() for p in range(poiL.getSize()) ],
+      'nuis': [ nuisL.at(p).getVal() for p in range(nuisL.getSize()) ],
+   }
+   r.update( fit )
+   return r
+
+def unconditionalFit( w, mc, nll, poiL, nuisL ):
+   preFit( w, mc, nll )
+   fit,fitResult = minimize( nll, keepFitResult=True )
+   return (fitRecord( -1, nll, poiL, nuisL, fit ),fitResult)
+
+def cachedUnconditionalFit( w, mc, nll, poiL, nuisL ):
+   """ Returns the record of the unconditional fit from the fit cache. The
+   fit is only done if no other job did it before. Afterwards, the
+   parameters are at the best fit values and the nuisance parameters have
+   the errors from the fit. A record that was fitted by another job has
+   'cached' set, because its timing and status belong to that job. """
+   fitCache = helperFitCache.FitCache(
+      options.fitCache,
+      helperFitCache.cacheKey( options, {'initVars': options.initVars} ),
+   )
+   print( "Unconditional fit cache: "+fitCache.fileName )
+
+   fitted = []
+   def fit():
+      fitted.append( True )
+      r,fitResult = unconditionalFit( w, mc, nll, poiL, nuisL )
+      record = dict( r )
+      record['poiNames'] = [ poiL.at(p).GetName() for p in range(poiL.getSize()) ]
+      record['nuisNames'] = [ nuisL.at(p).GetName() for p in range(nuisL.getSize()) ]
+      return (record,fitResult)
+   record = fitCache.fetch( fit )
+
+   for p,v in enumerate( record['pois'] ): poiL.at(p).setVal( v )
+   for p,v in enumerate( record['nuis'] ): nuisL.at(p).setVal( v )
+   fitResult = fitCache.readFitResult()
+   floatPars = fitResult.floatParsFinal()
+   for p in range( floatPars.getSize() ):
+      par = floatPars.at(p)
+      if w.var( par.GetName() ): w.var( par.GetName() ).setError( par.getError() )
+   r = dict( [(k,v) for k,v in record.items() if k not in ('poiNames','nuisNames')] )
+   if not fitted: r['cached'] = True
+   return r
+
+def resultLine( r, poiL, nuisL ):
+   """ Formats a result from conditionalFit() for the log. """
+   result = "nll="+str(r['nll'])+", "
+   # poi values
+   result += ", ".join( [poiL.at(p).GetName()+"="+str(v) for p,v in enumerate(r['pois'])] )
+   # nuisance parameter values if requested
+   if options.printAllNuisanceParameters:
+      result += ", "
+      result += ", ".join( [nuisL.at(p).GetName()+"="+str(v) for p,v in enumerate(r['nuis'])] )
+   return result
+
+
+
+
+def journalConfig( poiL, nuisL, poiGrid ):
+   """ Everything that determines the grid points and their assignment to
+   this job. A journal can only be resumed with the same configuration. """
+   return {
+      'input': options.input,
+      'wsName': options.wsName,
+      'mcName': options.mcName,
+      'dataName': options.dataName,
+      'pois': [ [poiL.at(p).GetName()]+list(poiGrid[p]) for p in range(poiL.getSize()) ],
+      'nuis': [ nuisL.at(p).GetName() for p in range(nuisL.getSize()) ],
+      'points': options.points,
+      'design': options.design,
+      'numPoints': len( scanPoints or [] ),
+      'scanOrder': options.scanOrder,
+      'adaptive': options.adaptive,
+      'adaptiveDepth': options.adaptiveDepth,
+      'jobs': options.jobs,
+      'counter': options.counter,
+      'unconditionalFitInSeparateJob': options.unconditionalFitInSeparateJob,
+   }
+
+def readJournal( fileName ):
+   """ Returns the configuration and a dictionary of the results by grid
+   index. Lines that cannot be parsed, like the last line of a job that was
+   killed while writing, are skipped. """
+   config,done = (None,{})
+   f = open( fileName )
+   for l in f:
+      try:
+         entry = json.loads( l )
+      except ValueError:
+         print( "WARNING: Skipping incomplete line in journal: "+l )
+         continue
+      if 'config' in entry: config = entry['config']
+      else: done[ entry['index'] ] = entry
+   f.close()
+   return (config,done)
+
+
+class ScanOutput:
+   """ Reports results to the log, the result tree, the journal and the fit
+   report. """
+
+   def __init__( self, poiL, nuisL, resultTree=None, journal=None, report=None ):
+      self.poiL = poiL
+      self.nuisL = nuisL
+      self.resultTree = resultTree
+      self.journal = journal
+      self.report = report
+
+   def add( self, r, fromJournal=False ):
+      if r['index'] < 0:
+         print( "ucmles -- nll="+str(r['nll'])+", "+", ".join( [self.poiL.at(p).GetName()+"="+str(v) for p,v in enumerate(r['pois'])] ) )
+      else:
+         print( resultLine( r, self.poiL, self.nuisL ) )
+      sys.stdout.flush()
+
+      if self.resultTree: self.resultTree.fill( r )
+      if self.report: self.report.add( r )
+      if self.journal and not fromJournal:
+         self.journal.write( json.dumps( r )+"\n" )
+         self.journal.flush()
+         os.fsync( self.journal.fileno() )
+
+   def close( self ):
+      if self.report:
+         print( "" )
+         print( self.report.text() )
+         print( "" )
+      if self.resultTree: self.resultTree.close()
+      if self.journal: self.journal.close()
+
+
+def retryFit( task ):
+   i,retryPass = task
+   return conditionalFit( i, retryPass )
+
+def fitPoints( indices, pool, function=conditionalFit ):
+   """ Runs conditionalFit() for all grid indices, in the worker pool if one
+   is given. The results are returned in the order of the indices. """
+   if not pool:
+      return ( function( i ) for i in indices )
+
+   chunksize = 1
+   # for warm starts, every worker should walk along a connected piece of the path
+   if options.warmStart: chunksize = max( 1, len(indices) // (8*options.workers) )
+   return pool.imap( function, indices, chunksize )
+
+def throttled( iterable, slots ):
+   """ Acquires one of the slots (a semaphore) for every item. """
+   for item in iterable:
+      slots.acquire()
+      yield item
+
+def processQueue( queue, pool, output ):
+   """ Claims points from the work queue and fits them until the queue is
+   empty. """
+   if not pool:
+      for i in queue.points():
+         output.add( conditionalFit( i ) )
+         queue.finish( i )
+      return
+
+   # Pool reads the tasks ahead in a separate thread. Limit the number of
+   # claimed points that are not finished yet, so that a job does not hold
+   # claims for points it cannot start soon.
+   slots = threading.Semaphore( 2*options.workers )
+   for r in pool.imap_unordered( conditionalFit, throttled( queue.points(), slots ) ):
+      slots.release()
+      output.add( r )
+      queue.finish( r['index'] )
+
+def processPoints( indices, pool, output, done ):
+   """ Reports the points that are already in the journal and fits all others.
+   Yields the results. """
+   for i in indices:
+      if i in done:
+         output.add( done[i], fromJournal=True )
+         yield done[i]
+
+   for r in fitPoints( [i for i in indices if i not in done], pool ):
+      output.add( r )
+      yield r
+
+
+
+
 def main():
-   ROOT.RooRandom.randomGenerator().SetSeed( 0 )
+   global fitContext, warmStartCache, scanPoints, strategyManager
+   helperSeeds.setSeed( helperSeeds.campaignSeed( options ), "scan", options.counter )
 
    f = ROOT.TFile.Open( options.input )
    w = f.Get( options.wsName )
@@ -201,7 +603,37 @@ def main():
    poiL = ROOT.RooArgList( mc.GetParametersOfInterest() )
    nuisL = ROOT.RooArgList( mc.GetNuisanceParameters() )
 
-   if options.fullRun: visualizeEnumeration( poiL )
+   # POI grid as (bins,min,max)
+   poiGrid = [ (poiL.at(p).getBins(),poiL.at(p).getMin(),poiL.at(p).getMax()) for p in range(poiL.getSize()) ]
+
+   adaptiveGrid = None
+   if options.adaptive:
+      if options.jobs != 1 or options.unconditionalFitInSeparateJob:
+         print( "ERROR: The adaptive scan needs all points and the unconditional fit in one job." )
+         return
+      adaptiveGrid = helperScanPoints.AdaptiveGrid( [b for b,low,high in poiGrid], options.adaptiveDepth )
+      poiGrid = [ adaptiveGrid.fineRange( *g ) for g in poiGrid ]
+
+   if options.points or options.design:
+      if adaptiveGrid:
+         print( "ERROR: The adaptive scan cannot be used with a list of points." )
+         return
+      if options.points:
+         scanPoints = helperScanPoints.readPoints( options.points, [poiL.at(p).GetName() for p in range(poiL.getSize())] )
+      else:
+         scanPoints = helperScanPoints.scaleToRanges(
+            helperScanPoints.design( options.design, poiL.getSize() ),
+            [ (low,high) for b,low,high in poiGrid ],
+         )
+      scanPath = list( range(len(scanPoints)) )
+      if options.scanOrder != "grid":
+         scanPath = helperScanPoints.hilbertSortPoints( scanPoints, [(low,high) for b,low,high in poiGrid] )
+   else:
+      scanPath = helperScanPoints.scanOrder( [b for b,low,high in poiGrid], options.scanOrder )
+   if options.fullRun and not adaptiveGrid and scanPoints is None: visualizeEnumeration( poiL, scanPath )
+   if adaptiveGrid and options.queue:
+      print( "ERROR: The adaptive scan cannot be used with a work queue." )
+      return
 
 
 
@@ -231,23 +663,31 @@ def main():
 
 
       
-   numPoints = reduce( lambda x,y: x*y, [poiL.at(d).getBins() for d in range(poiL.getSize())] )
+   numPoints = len( scanPath )
    firstPoint,lastPoint = jobBins( numPoints )
    print( "" )
    print( "### Batch Job" )
-   print( "* Total grid points: "+str(numPoints) )
+   if scanPoints is None: print( "* Total grid points: "+str(numPoints) )
+   else: print( "* Total points: "+str(numPoints)+" from "+(options.points or options.design) )
    jobsString = str(options.jobs)
    if options.unconditionalFitInSeparateJob: jobsString += " +1 for unconditional fit"
    else: jobsString += " (unconditional fit done in each job)"
    print( "* Total number of jobs: "+jobsString )
    print( "* This job number: "+str(options.counter) )
-   print( "* Processing these grid points: [%d,%d)" % (firstPoint,lastPoint) )
+   if options.queue:
+      print( "* Processing grid points from the work queue "+options.queue )
+   elif adaptiveGrid:
+      print( "* Adaptive scan around NLL-minNLL = "+options.adaptive+" with "+str(options.adaptiveDepth)+" refinement steps" )
+   else:
+      print( "* Processing these grid points: [%d,%d)" % (firstPoint,lastPoint) )
+   if options.scanOrder != "grid" and not options.queue: print( "* Scan order: "+options.scanOrder+" (the range above refers to positions along the scan path)" )
+   if options.workers > 1: print( "* Worker processes: "+str(options.workers) )
    print( "" )
 
    # for later plotting, print some book-keeping info
    print( "### Parameters Of Interest" )
    for p in range( poiL.getSize() ):
-      print( "* POI "+ ("%s=[%d,%f,%f]" % (poiL.at(p).GetName(),poiL.at(p).getBins(),poiL.at(p).getMin(),poiL.at(p).getMax())) )
+      print( "* POI "+ ("%s=[%d,%f,%f]" % ((poiL.at(p).GetName(),)+poiGrid[p])) )
    print( "" )
 
    # if all nuisance parameters are requested, also print their book-keeping info here
@@ -259,35 +699,132 @@ def main():
       print( "" )
 
 
-   # unconditional fit
+   if (options.journal or options.resultTree) and not os.path.exists( options.output ):
+      os.makedirs( options.output )
+
+   # journal of finished points
+   done = {}
+   journal = None
+   if options.journal:
+      journalFile = os.path.join( options.output, "journal_%d.jsonl" % options.counter )
+      config = journalConfig( poiL, nuisL, poiGrid )
+      if options.resume and os.path.exists( journalFile ):
+         journalConfigRead,done = readJournal( journalFile )
+         if journalConfigRead != json.loads( json.dumps(config) ):
+            print( "ERROR: The journal "+journalFile+" was written for a different configuration:" )
+            print( "journal: "+str(journalConfigRead) )
+            print( "now:     "+str(config) )
+            return
+         print( "Resuming with "+str(len(done))+" points from the journal "+journalFile+"." )
+         journal = open( journalFile, "a" )
+         # terminate an incomplete last line
+         if os.path.getsize( journalFile ) > 0:
+            with open( journalFile, "rb" ) as jf:
+               jf.seek( -1, os.SEEK_END )
+               if jf.read( 1 ) != b"\n": journal.write( "\n" )
+      else:
+         journal = open( journalFile, "w" )
+         journal.write( json.dumps( {'config': config} )+"\n" )
+
+   resultTree = None
+   if options.resultTree:
+      resultTree = helperProfileTree.ResultTreeWriter(
+         os.path.join( options.output, "profileLikelihood_%d.root" % options.counter ),
+         poiL, nuisL, poiGrid,
+      )
+   report = helperFitReport.FitReport( [poiL.at(p).GetName() for p in range(poiL.getSize())], poiGrid )
+   output = ScanOutput( poiL, nuisL, resultTree, journal, report )
+
+   # unconditional fit (with the fit cache, the conditional jobs also get
+   # the global minimum when it is fitted in a separate job)
    if (not options.unconditionalFitInSeparateJob) or \
-      (options.unconditionalFitInSeparateJob and options.counter == options.jobs):
+      (options.unconditionalFitInSeparateJob and options.counter == options.jobs) or \
+      options.fitCache:
       for p in range( poiL.getSize() ): poiL.at(p).setConstant(False)
       print( "" )
       print( "--- unconditional fit ---" )
-      preFit( w, mc, nll )
-      minimize( nll )
-      print( "ucmles -- nll="+str(nll.getVal())+", "+", ".join( [poiL.at(p).GetName()+"="+str(poiL.at(p).getVal()) for p in range(poiL.getSize())] ) )
+      if -1 in done:
+         # restore the global minimum from the journal
+         r = done[-1]
+         for p,v in enumerate( r['pois'] ): poiL.at(p).setVal( v )
+         for p,v in enumerate( r['nuis'] ): nuisL.at(p).setVal( v )
+         output.add( r, fromJournal=True )
+      elif options.fitCache:
+         r = cachedUnconditionalFit( w, mc, nll, poiL, nuisL )
+         output.add( r )
+      else:
+         r,fitResult = unconditionalFit( w, mc, nll, poiL, nuisL )
+         output.add( r )
+      minNLL = r['nll']
 
    # conditional fits
-   for p in range( poiL.getSize() ): poiL.at(p).setConstant()
-   for i in range( firstPoint,lastPoint ):
-      parametersNCube( poiL, i )
+   for p in range( poiL.getSize() ):
+      poiL.at(p).setConstant()
+      # for an adaptive scan, this is the fine grid
+      poiL.at(p).setBins( poiGrid[p][0] )
+      poiL.at(p).setRange( poiGrid[p][1], poiGrid[p][2] )
+   fitContext = (w,mc,nll,poiL,nuisL)
+   if options.strategyRegions > 0: strategyManager = StrategyManager( poiL, options.strategyRegions )
+   if options.warmStart:
+      warmStartCache = WarmStartCache( poiL )
+      for r in done.values():
+         if r['index'] >= 0 and r['status'] in (0,1): warmStartCache.store( r['pois'], r['nuis'] )
+   sys.stdout.flush()
+
+   pool = None
+   if options.workers > 1:
+      # fork after the unconditional fit: every worker starts with a copy of
+      # the model and the nll at the global minimum
+      import multiprocessing
+      pool = multiprocessing.Pool( options.workers )
+
+   if options.queue:
+      if not (options.unconditionalFitInSeparateJob and options.counter == options.jobs):
+         # the queue is shared by all jobs, so the job split is not part of its configuration
+         queueConfig = journalConfig( poiL, nuisL, poiGrid )
+         del queueConfig['jobs']
+         del queueConfig['counter']
+         queue = helperWorkQueue.WorkQueue( options.queue, queueConfig, options.leaseTime )
+         if queue.storedConfig != json.loads( json.dumps(queueConfig) ):
+            print( "ERROR: The work queue "+options.queue+" was created for a different configuration:" )
+            print( "queue: "+str(queue.storedConfig) )
+            print( "now:   "+str(queueConfig) )
+            return
+         queue.populate( scanPath )
+         # points in the journal of this job are reported again but not fitted
+         for i in sorted( done.keys() ):
+            if i < 0: continue
+            output.add( done[i], fromJournal=True )
+            queue.finish( i )
+         processQueue( queue, pool, output )
+         print( "" )
+         print( "--- work queue (todo,claimed,finished): "+str(queue.counts())+" ---" )
+         queue.close()
+   elif adaptiveGrid:
+      levels = [ float(l) for l in options.adaptive.split(",") ]
+      while True:
+         points = adaptiveGrid.newPoints()
+         print( "" )
+         print( "--- adaptive scan: %d new points with cell size %d ---" % (len(points),adaptiveGrid.cellSize) )
+         for r in processPoints( points, pool, output, done ):
+            adaptiveGrid.setValue( r['index'], r['nll']-minNLL )
+         if not adaptiveGrid.refine( levels ): break
+   else:
+      # results are reported by this process in scan order
+      for r in processPoints( scanPath[firstPoint:lastPoint], pool, output, done ): pass
+
+   # second chance for the failed points of this job
+   for retryPass in range( 1, options.retryPasses+1 ):
+      failed = report.failedIndices()
+      if not failed: break
       print( "" )
-      print( "--- next point: "+str(i)+" ---" )
-      print( "Parameters Of Interest: "+str([ poiL.at(p).getVal() for p in range(poiL.getSize()) ]) )
-      preFit( w, mc, nll )
-      minimize( nll )
-      
-      # build result line
-      result = "nll="+str(nll.getVal())+", "
-      # poi values
-      result += ", ".join( [poiL.at(p).GetName()+"="+str(poiL.at(p).getVal()) for p in range(poiL.getSize())] )
-      # nuisance parameter values if requested
-      if options.printAllNuisanceParameters:
-         result += ", "
-         result += ", ".join( [nuisL.at(p).GetName()+"="+str(nuisL.at(p).getVal()) for p in range(nuisL.getSize())] )
-      print( result )
+      print( "--- retry pass %d: %d failed points ---" % (retryPass,len(failed)) )
+      for r in fitPoints( [(i,retryPass) for i in failed], pool, retryFit ): output.add( r )
+
+   if pool:
+      pool.close()
+      pool.join()
+   output.close()
       
 
 
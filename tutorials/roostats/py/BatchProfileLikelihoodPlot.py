@@ -11,91 +11,71 @@ __version__ = "0.1"
 import optparse
 
 parser = optparse.OptionParser(version="0.1")
-parser.add_option("-i", "--inputFiles", help="glob expression for log files from BatchProfileLikelihood.py", type="string", dest="inputFiles", default="batchProfile.log")
+parser.add_option("-i", "--inputFiles", help="glob expression for log files or result trees (.root) from BatchProfileLikelihood.py", type="string", dest="inputFiles", default="batchProfile.log")
 parser.add_option("-o", "--outputFile", help="output root file", type="string", dest="outputFile", default="PL_data.root")
 parser.add_option(      "--subtractMinNLL", help="subtracts the minNLL", dest="subtractMinNLL", default=False, action="store_true")
+parser.add_option(      "--fillEmptyBins", help="Bins without a scan point get the value of the nearest filled bin (use for adaptive scans).", dest="fillEmptyBins", default=False, action="store_true")
+parser.add_option(      "--fitCache", help="Take the best fit and minNLL from this unconditional fit cache file of BatchProfileLikelihood.py instead of the ucmles lines.", dest="fitCache", default=None)
+parser.add_option(      "--workers", help="Number of processes that parse the log files in parallel.", dest="workers", type="int", default=1)
+parser.add_option(      "--chunkSize", help="Size in bytes of the ranges of the log files that are parsed by one worker task. The memory for parsing is about two ranges per worker.", dest="chunkSize", type="int", default=1 << 24)
+parser.add_option(      "--state", help="Incremental mode for log files: keep the aggregated bins in this state file and only read new files and new lines on the next run. The output file is updated in place.", dest="state", default=None)
+parser.add_option(      "--contours", help="Comma separated NLL-minNLL levels. For two POIs, the contours of the profiled NLL at these levels are written as graphs contour_<level>_<n>. Example: \"0.5,2.0\".", dest="contours", default=None)
 #parser.add_option(      "--
 parser.add_option("-q", "--quiet", dest="verbose", action="store_false", default=True, help="Quiet output.")
 (options, args) = parser.parse_args()
 
 import ROOT
 import PyROOTUtils
+import helperProfileTree
+import helperFitCache
+import helperLogIngest
+import helperProfileHist
+import helperScanState
+import helperContours
 
 import os, math
-import glob, re
-from array import array
+import glob
+import numpy as np
 
 
 
 
 
-def getInputFromLogs( files ):
-   files = glob.glob( options.inputFiles )
-   print( "Files: "+str(files) )
-   
-   bestFit = {}
-   NLL = {'nll':[]}
-   POIs = []
-   NUISs = []
-   
-   regexParValue = re.compile( "^(?P<par>[-\b\w\d_\.]+)=(?P<value>[-\d\.einf]+)$" )
-   
-   for fName in files:
-      print( "Opening "+fName )
-      f = open( fName )
-      for l in f:
-         if l[:6] == "* POI ":
-            poiName = l[6:l.find("=")]
-            poiConfig = l[l.find("=")+2:-2]
-            poiConfig = [ float(p) for p in poiConfig.split(",") ]
-            if poiName not in [p[0] for p in POIs]:
-               POIs.append( (poiName, poiConfig) )
-               NLL[ poiName ] = []
-         if l[:7] == "* NUIS ":
-            nuisName = l[7:l.find("=")]
-            nuisConfig = l[l.find("=")+2:-2]
-            nuisConfig = [ float(p) for p in nuisConfig.split(",") ]
-            if nuisName not in [p[0] for p in NUISs]:
-               NUISs.append( (nuisName, nuisConfig) )
-               NLL[ nuisName ] = []
-               
-         if l[:4] == "nll=":
-#             parAndValue = [(r.split("=")[0],float(r.split("=")[1])) for r in l.split(", ")]
-#             for p,v in parAndValue: NLL[p].append(v)
-            pars = {}
-            parAndValues = l.split(", ")
-            for pv in parAndValues:
-               regm = regexParValue.match( pv )
-               if regm:
-                  try:
-                     pars[ regm.groupdict()['par'] ] = float(regm.groupdict()['value'])
-                  except ValueError:
-                     print( "WARNING could not convert value to float." )
-            
-            if len( pars.keys() ) == len( NLL.keys() ):
-               for p,v in pars.iteritems():
-                  NLL[ p ].append( v )
-            else:
-               print( "WARNING: Did not find all parameters. Not adding values. line: "+l )
-         if l[:14] == "ucmles -- nll=":
-            parAndValue = [(r.split("=")[0],float(r.split("=")[1])) for r in l.split(", ")]
-            for p,v in parAndValue:
-               if p == "ucmles -- nll": p = "nll"
-               bestFit[p] = v
-#             parAndValues = l.split(", ")
-#             for pv in parAndValues:
-#                regm = regexParValue.match( pv )
-#                if regm: 
-#                   par = regm.groupdict()['par']
-#                   if par == "ucmles -- nll": par = "nll"
-#                   NLL[ par ].append(  float(regm.groupdict()['value'])   )
-      f.close()
-      
-   return (POIs,NUISs,NLL,bestFit)
+def readState( files ):
+   """ Updates the state file with the new lines of the log files. Returns
+   (POIs,NUISs,bestFit,state). """
+   state = helperScanState.load( options.state )
+   if not state.isValid( files ):
+      print( "Log files were removed or rewritten since the last run. Reading all files again." )
+      state = helperScanState.ScanState()
+   newPoints = state.update( files, options.workers, options.chunkSize )
+   print( "New points: "+str(newPoints) )
+   state.save( options.state )
+   return (state.POIs,state.NUISs,state.bestFit,state)
 
 
 def main():
-   POIs,NUISs,NLL,bestFit = getInputFromLogs( options.inputFiles )
+   files = glob.glob( options.inputFiles )
+   # NLL holds the columns of all points; in incremental mode, only the
+   # aggregated state is available
+   NLL = None
+   state = None
+   if files and not [f for f in files if not f.endswith(".root")]:
+      POIs,NUISs,NLL,bestFit = helperProfileTree.readResultTrees( files )
+   elif options.state:
+      POIs,NUISs,bestFit,state = readState( files )
+   else:
+      POIs,NUISs,NLL,bestFit = helperLogIngest.readLogs( files, options.workers, options.chunkSize )
+   if NLL:
+      for c in NLL.keys(): NLL[c] = np.asarray( NLL[c], dtype=np.float64 )
+
+   if options.fitCache:
+      record = helperFitCache.readFitCache( options.fitCache )
+      if not record:
+         print( "ERROR: Could not read the fit cache "+options.fitCache )
+         return
+      bestFit = dict( zip( record['poiNames'], record['pois'] ) )
+      bestFit['nll'] = record['nll']
 
    print( "\n--- POIs ---" )
    print( POIs )
@@ -104,80 +84,97 @@ def main():
    print( bestFit )
 
    print( "\n--- NLL ---" )
-   maxNLL = max( [n for n in NLL['nll'] if n < 1e10] )
-   if "nll" in bestFit:
-      minNLL = bestFit["nll"]
+   if state:
+      if not POIs or state.minima is None:
+         print( "ERROR: No scan points found." )
+         return
+      maxNLL,minNLL = (state.maxNLL,state.minNLL)
+      minima,filled = (state.minima,state.filled)
    else:
-      minNLL = min( [n for n in NLL['nll']] )
-   for i in range( len(NLL['nll']) ):
-      if NLL['nll'][i] < minNLL: NLL['nll'][i] = minNLL
-      if NLL['nll'][i] > maxNLL: NLL['nll'][i] = maxNLL
+      if not POIs or not len( NLL['nll'] ):
+         print( "ERROR: No scan points found." )
+         return
+      maxNLL = NLL['nll'][ NLL['nll'] < 1e10 ].max()
+      minNLL = np.nanmin( NLL['nll'] )
+      minima,filled = helperProfileHist.binMinimum( NLL, POIs, NLL['nll'], np.inf )
+   if "nll" in bestFit: minNLL = bestFit["nll"]
+   if NLL: NLL['nll'] = np.clip( NLL['nll'], minNLL, maxNLL )
    print( "(minNLL,maxNLL) = (%f,%f)" % (minNLL,maxNLL) )
 
-   nllHist = None
-   maxHist = maxNLL
-   if options.subtractMinNLL: maxHist -= minNLL
-   if len( POIs ) == 1:
-      poi = POIs[0]
-      nllHist = ROOT.TH1D( "profiledNLL", "profiled NLL;"+poi[0]+";NLL", int(poi[1][0]), poi[1][1], poi[1][2] )
-      
-      # initialize to maxNLL
-      for i in range( nllHist.GetNbinsX()+2 ): nllHist.SetBinContent( i, maxHist )
-
-      for nll,p in zip(NLL['nll'],NLL[poi[0]]):
-         bin,val = (None,None)
-         bin = nllHist.FindBin( p )
-         val = nll
-         if options.subtractMinNLL: val -= minNLL
-         if nllHist.GetBinContent( bin ) > val: nllHist.SetBinContent( bin, val )
-   if len( POIs ) == 2:
-      poi1 = POIs[0]
-      poi2 = POIs[1]
-      nllHist = ROOT.TH2D( 
-         "profiledNLL", "profiled NLL;"+poi1[0]+";"+poi2[0]+";NLL",
-         int(poi1[1][0]), poi1[1][1], poi1[1][2],
-         int(poi2[1][0]), poi2[1][1], poi2[1][2],
-      )
-      
-      # initialize to maxNLL
-      for i in range( (nllHist.GetNbinsX()+2)*(nllHist.GetNbinsY()+2) ): nllHist.SetBinContent( i, maxHist )
-
-      for nll,p1,p2 in zip(NLL['nll'],NLL[poi1[0]],NLL[poi2[0]]):
-         bin,val = (None,None)
-         bin = nllHist.FindBin( p1,p2 )
-         val = nll
-         if options.subtractMinNLL: val -= minNLL
-         if nllHist.GetBinContent( bin ) > val: nllHist.SetBinContent( bin, val )
-      
-   if not nllHist:
-      print( "ERROR: Couldn't create nll histogram." )
-      return
+   # profiled NLL for all POIs and all 1D and 2D projections (the minimum
+   # over the other POIs); empty bins are at maxNLL
+   minima = np.clip( minima, minNLL, maxNLL )
+   if options.subtractMinNLL: minima -= minNLL
+   proj = helperProfileHist.projections( minima, filled )
+   if options.fillEmptyBins:
+      minima,filled = helperProfileHist.fillEmptyBins( minima, filled )
+      for axes,(m,f) in proj.items(): proj[ axes ] = helperProfileHist.fillEmptyBins( m, f )
+
+   axisTitles = ";".join( [p[0] for p in POIs] )
+   nllHist = helperProfileHist.toHistogram( "profiledNLL", "profiled NLL;"+axisTitles+";NLL", minima, POIs )
+   projHistos = []
+   for axes,(m,f) in sorted( proj.items() ):
+      projPOIs = [ POIs[a] for a in axes ]
+      names = [ p[0] for p in projPOIs ]
+      projHistos.append( helperProfileHist.toHistogram(
+         "profiledNLL_"+"_".join( names ),
+         "profiled NLL;"+";".join( names )+";NLL",
+         m, projPOIs,
+      ) )
+
+   contourGraphs = []
+   if options.contours and len( POIs ) == 2:
+      levels = [ float(l) for l in options.contours.split(",") ]
+      offset = 0.0
+      if not options.subtractMinNLL: offset = minNLL
+      for level,graphs in zip( levels, helperContours.contours( nllHist, [l+offset for l in levels] ) ):
+         for i,g in enumerate( graphs ):
+            g.SetName( "contour_%g_%d" % (level,i) )
+            contourGraphs.append( g )
+
+   # fit instrumentation (only available from result trees)
+   fitHistos = []
+   if NLL and "status" in NLL:
+      failed = ~np.isin( NLL['status'], (0,1) )
+      fitHistos = [
+         helperProfileHist.toHistogram( "failedFits", "failed fits;"+axisTitles, helperProfileHist.binSum( NLL, POIs, failed ), POIs ),
+         helperProfileHist.toHistogram( "fitTime", "fit time [s];"+axisTitles, helperProfileHist.binSum( NLL, POIs, NLL['time'] ), POIs ),
+      ]
    
       
    # 2d debug histos
    histos2d = {}
    # change the names below for your model
    params2d = [(POIs[0][0],"nuis1","nuis2"),(POIs[0][0],"nuis1","nuis3")]
+   if not NLL: params2d = []
    for poi,nuis1,nuis2 in params2d:
-      nu1 = [ n for n in NUISs if nuis1==n[0] ]
-      nu2 = [ n for n in NUISs if nuis2==n[0] ]
-      if len( nu1 ) != 1   or   len( nu2 ) != 1: continue
-      nu1 = nu1[0]
-      nu2 = nu2[0]
-      h = ROOT.TH2D( 
-         poi+"_"+nuis1+"_"+nuis2, poi+"_"+nuis1+"_"+nuis2, 
-         int(nu1[1][0]), nu1[1][1], nu1[1][2],
-         int(nu2[1][0]), nu2[1][1], nu2[1][2],
+      nu = [ n for n in NUISs if n[0] in (nuis1,nuis2) ]
+      if len( nu ) != 2: continue
+      nu.sort( key=lambda n: (nuis1,nuis2).index( n[0] ) )
+      h = helperProfileHist.toHistogram(
+         poi+"_"+nuis1+"_"+nuis2, poi+"_"+nuis1+"_"+nuis2,
+         helperProfileHist.binLast( NLL, nu, NLL[poi] ), nu,
       )
-      for poiVal,n1,n2 in zip( NLL[poi], NLL[nuis1], NLL[nuis2] ):
-         h.SetBinContent( h.FindBin( n1,n2 ), poiVal )
       histos2d[ h.GetName() ] = h
 
    # create tgraphs
    nllTGraphs = {}
    nuisParGraphs = {}
+   nllTGraph = None
+   if not NLL:
+      # only the bin minima are known: graphs of the 1D profiles
+      for i,poi in enumerate( POIs ):
+         m,f = (minima,filled)
+         if len( POIs ) > 1: m,f = proj[ (i,) ]
+         bins,low,high = poi[1]
+         centers = low + (np.arange( int(bins)+2 )-0.5)*(high-low)/bins
+         inside = f & (np.arange( int(bins)+2 ) >= 1) & (np.arange( int(bins)+2 ) <= bins)
+         nllTGraph = PyROOTUtils.Graph( list( centers[inside] ), list( m[inside] ) )
+         nllTGraphs[poi[0]] = nllTGraph
    for poi in POIs:
-      pn = [ (p,n) for p,n in zip(NLL[poi[0]], NLL['nll']) if n < minNLL+100.0 ]
+      if not NLL: break
+      near = NLL['nll'] < minNLL+100.0
+      pn = list( zip( NLL[poi[0]][near], NLL['nll'][near] ) )
       nllTGraph = PyROOTUtils.Graph( pn )
       if options.subtractMinNLL: nllTGraph.add( -minNLL )
       nllTGraphs[poi[0]] = nllTGraph
@@ -194,15 +191,27 @@ def main():
       bestFitMarker = ROOT.TMarker( bestFit[ POIs[0][0] ], bestFit[ POIs[1][0] ], 2 )
       
       
-   f = ROOT.TFile( options.outputFile, "RECREATE" )
-   nllHist.Write()
+   if state:
+      # replace the objects of the previous run
+      f = ROOT.TFile( options.outputFile, "UPDATE" )
+      writeOption = ROOT.TObject.kOverwrite
+   else:
+      f = ROOT.TFile( options.outputFile, "RECREATE" )
+      writeOption = 0
+   nllHist.Write( "", writeOption )
+   for h in projHistos:
+      h.Write( "", writeOption )
    for p,g in nllTGraphs.iteritems():
-      if g: g.Write( "nll_"+p )
+      if g: g.Write( "nll_"+p, writeOption )
    for p,g in nuisParGraphs.iteritems():
-      if g: g.Write( "nuisParGraph_"+p )
+      if g: g.Write( "nuisParGraph_"+p, writeOption )
    for h in histos2d.values():
-      h.Write()
-   if bestFitMarker: bestFitMarker.Write("bestFit")
+      h.Write( "", writeOption )
+   for h in fitHistos:
+      h.Write( "", writeOption )
+   for g in contourGraphs:
+      g.Write( "", writeOption )
+   if bestFitMarker: bestFitMarker.Write( "bestFit", writeOption )
    f.Close()
    
    if options.verbose:
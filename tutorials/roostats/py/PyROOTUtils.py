@@ -4,8 +4,9 @@ __author__ = "Sven Kreiss, Kyle Cranmer"
 __version__ = "0.1"
 __doc__ = """
 Module providing some convenience classes for ROOT. This helps making fixed font size
-legends, graphs from Python lists, Bands from lists including outlines of Bands. One
-of the highlights is also putting text on graphs including multi-line support; and
+legends, graphs from Python lists or NumPy arrays, Bands from lists including outlines
+of Bands. The points of graphs and bands are available as NumPy views with xyArrays().
+One of the highlights is also putting text on graphs including multi-line support; and
 it is just a single function call.
 
 Alignment is clearer: halign="right", valign="bottom" is translated automatically into
@@ -15,7 +16,219 @@ the number codes that represent the alignment.
 
 
 import ROOT
-from array import array
+import numpy as np
+
+
+
+def bufferArray( buf, n, dtype=np.float64 ):
+   """ NumPy view of the first n doubles (or elements of dtype) of a buffer
+   returned by ROOT, for example TGraph::GetX(). """
+   if n == 0: return np.zeros( 0, dtype=dtype )
+   if hasattr( buf, "SetSize" ): buf.SetSize( n )
+   elif hasattr( buf, "reshape" ): buf.reshape( (n,) )
+   return np.frombuffer( buf, dtype=dtype, count=n )
+
+def graphArrays( graph ):
+   """ NumPy views of the x and y values of a TGraph. They share the memory
+   with the graph, so changing them changes the graph. """
+   n = graph.GetN()
+   return ( bufferArray( graph.GetX(), n ), bufferArray( graph.GetY(), n ) )
+
+def doubles( values ):
+   """ Contiguous float64 array that can be passed to ROOT as double*. """
+   return np.ascontiguousarray( values, dtype=np.float64 )
+
+def treeColumns( tree, expressions, selection="" ):
+   """ Values of the expressions for all entries of the tree (or chain) that
+   pass the selection as float64 arrays. TTree::Draw() evaluates four
+   expressions per pass in C++ and its buffers are copied in bulk. Returns
+   (columns,weights) where weights are the entry weights of TTree::GetW(). """
+   tree.SetEstimate( tree.GetEntries()+1 )
+   columns = []
+   weights = np.zeros( 0 )
+   for first in range( 0, len(expressions), 4 ):
+      group = expressions[first:first+4]
+      n = tree.Draw( ":".join(group), selection, "goff" )
+      for j in range( len(group) ):
+         columns.append( bufferArray( tree.GetVal(j), n ).copy() )
+      if first == 0: weights = bufferArray( tree.GetW(), n ).copy()
+   return (columns,weights)
+
+
+def refineRoots( f, a, b, fa, fb, tolerance=1e-10, maxIterations=100 ):
+   """ Roots of f in the brackets [a,b] where f(a) and f(b) have different
+   signs, for arrays of brackets at once. f is called with an array of x
+   values (one per bracket). Uses secant steps and falls back to bisection
+   when a step leaves the bracket or does not shrink it fast enough
+   (Dekker's method). """
+   a,b,fa,fb = [ np.array( v, dtype=np.float64 ) for v in (a,b,fa,fb) ]
+   done = np.zeros( a.shape, dtype=bool )
+   exact = np.zeros( a.shape, dtype=bool )
+   root = np.zeros( a.shape )
+   for i in range( maxIterations ):
+      done |= b-a < tolerance*np.maximum( 1.0, abs(a)+abs(b) )
+      if done.all(): break
+      x = 0.5*(a+b)
+      # use the secant step only when it stays well inside the bracket
+      secant = b - fb*(b-a)/np.where( fb != fa, fb-fa, 1.0 )
+      useSecant = (fb != fa) & (a+0.1*(b-a) < secant) & (secant < b-0.1*(b-a))
+      x = np.where( useSecant, secant, x )
+      fx = f( x )
+      found = ~done & (fx == 0.0)
+      root = np.where( found, x, root )
+      exact |= found
+      done |= found
+      left = ~done & ((fx > 0) == (fa > 0))
+      right = ~done & ~left
+      a,fa = (np.where( left, x, a ),np.where( left, fx, fa ))
+      b,fb = (np.where( right, x, b ),np.where( right, fx, fb ))
+   final = np.where( fb == fa, 0.5*(a+b), b - fb*(b-a)/np.where( fb != fa, fb-fa, 1.0 ) )
+   return np.where( exact, root, final )
+
+
+def splineCoefficients( x, y ):
+   """ Cubic spline through the points of every row of x and y (sorted by
+   x) with the not-a-knot end conditions, the same spline as TSpline3 and
+   TGraph::Eval(x,0,"S"). Returns (b,c,d) of shape (rows,points-1): on the
+   segment k, the spline is y_k + b_k t + c_k t^2 + d_k t^3 with t = x-x_k.
+   The tridiagonal system for the second derivatives is solved for all rows
+   at once. """
+   x,y = (np.atleast_2d( x ),np.atleast_2d( y ))
+   n = x.shape[1]
+   h = np.diff( x, axis=1 )
+   delta = np.diff( y, axis=1 )/h
+   m = np.zeros( x.shape )
+   if n == 3:
+      # not-a-knot at both ends of three points: the parabola
+      m[:] = (2.0*(delta[:,1]-delta[:,0])/(x[:,2]-x[:,0]))[:,None]
+   elif n > 3:
+      # equations for the second derivatives m_1..m_n-2; the not-a-knot
+      # conditions eliminate m_0 and m_n-1 from the first and last one
+      lower = h[:,:-1].copy()
+      diag = 2.0*(h[:,:-1]+h[:,1:])
+      upper = h[:,1:].copy()
+      rhs = 6.0*np.diff( delta, axis=1 )
+      diag[:,0] = (h[:,0]+h[:,1])*(h[:,0]+2.0*h[:,1])/h[:,1]
+      upper[:,0] = (h[:,1]**2-h[:,0]**2)/h[:,1]
+      diag[:,-1] = (h[:,-2]+h[:,-1])*(2.0*h[:,-2]+h[:,-1])/h[:,-2]
+      lower[:,-1] = (h[:,-2]**2-h[:,-1]**2)/h[:,-2]
+      # Thomas algorithm
+      for i in range( 1, n-2 ):
+         w = lower[:,i]/diag[:,i-1]
+         diag[:,i] -= w*upper[:,i-1]
+         rhs[:,i] -= w*rhs[:,i-1]
+      inner = np.zeros( rhs.shape )
+      inner[:,-1] = rhs[:,-1]/diag[:,-1]
+      for i in range( n-4, -1, -1 ):
+         inner[:,i] = (rhs[:,i]-upper[:,i]*inner[:,i+1])/diag[:,i]
+      m[:,1:-1] = inner
+      m[:,0] = ((h[:,0]+h[:,1])*m[:,1]-h[:,0]*m[:,2])/h[:,1]
+      m[:,-1] = ((h[:,-2]+h[:,-1])*m[:,-2]-h[:,-1]*m[:,-3])/h[:,-2]
+   b = delta - h*(2.0*m[:,:-1]+m[:,1:])/6.0
+   c = 0.5*m[:,:-1]
+   d = (m[:,1:]-m[:,:-1])/(6.0*h)
+   return (b,c,d)
+
+def segmentIndices( x, rows, v ):
+   """ Index k of the segment [x_k,x_k+1] of the row of x that contains v.
+   Outside of the points, the first or last segment. """
+   k = (x[rows] <= np.asarray( v )[...,None]).sum( axis=-1 ) - 1
+   return np.clip( k, 0, x.shape[1]-2 )
+
+def linearAt( x, y, rows, v ):
+   """ Linear interpolation (and extrapolation) of the rows of the points at
+   v like TGraph::Eval(). """
+   k = segmentIndices( x, rows, v )
+   x0,x1,y0,y1 = (x[rows,k],x[rows,k+1],y[rows,k],y[rows,k+1])
+   slope = np.where( x1 > x0, (y1-y0)/np.where( x1 > x0, x1-x0, 1.0 ), 0.0 )
+   return y0 + (v-x0)*slope
+
+def splineAt( x, y, coefficients, rows, v ):
+   """ The splines of splineCoefficients() of the rows at v. """
+   k = segmentIndices( x, rows, v )
+   t = v - x[rows,k]
+   b,c,d = [ a[rows,k] for a in coefficients ]
+   return y[rows,k] + t*(b + t*(c + t*d))
+
+
+def intersectionsWithValues( x, y, values, xCenter, xLow=None, xHigh=None, spline=False ):
+   """ Crossings of many graphs with many values at once. x and y have the
+   shape (graphs,points) with the points of every graph sorted by x (for
+   example from Graph.sortedArrays()). values has the shape (values,) or
+   (graphs,values). xCenter, xLow and xHigh are numbers or have one entry
+   per graph; the range defaults to the points of every graph.
+
+   Returns (low,high) of shape (graphs,values): the closest crossings below
+   and above xCenter within [xLow,xHigh], NaN where there is none. The graphs
+   are linear between their points, so the crossings are exact. With
+   spline=True, the crossings are refined on the cubic spline through the
+   points (as TGraph::Eval(x,0,"S")). """
+   x = np.atleast_2d( np.asarray( x, dtype=np.float64 ) )
+   y = np.atleast_2d( np.asarray( y, dtype=np.float64 ) )
+   numGraphs,n = x.shape
+   values = np.zeros( (numGraphs,1) ) + np.asarray( values, dtype=np.float64 )
+   low = np.full( values.shape, np.nan )
+   high = np.full( values.shape, np.nan )
+   if n < 2: return (low,high)
+
+   if xLow is None: xLow = x[:,0]
+   if xHigh is None: xHigh = x[:,-1]
+   xLow,xCenter,xHigh = [ np.zeros( numGraphs ) + np.asarray( v, dtype=np.float64 ) for v in (xLow,xCenter,xHigh) ]
+   rows = np.arange( numGraphs )[:,None]
+
+   # knots: the points (moved onto the range ends when they are outside),
+   # the range ends and the center; the difference to a value is linear
+   # between the knots
+   ends = np.array( [xLow,np.clip( xCenter, xLow, xHigh ),xHigh] ).T
+   endValues = linearAt( x, y, rows, ends )
+   knots = np.concatenate( [np.clip( x, xLow[:,None], xHigh[:,None] ),ends], axis=1 )
+   knotValues = np.concatenate( [
+      np.where( x < xLow[:,None], endValues[:,:1], np.where( x > xHigh[:,None], endValues[:,2:], y ) ),
+      endValues,
+   ], axis=1 )
+   order = np.argsort( knots, axis=1, kind="mergesort" )
+   knots,knotValues = (knots[rows,order],knotValues[rows,order])
+
+   # closest sign changes of the difference below and above the center;
+   # "sign" means difference > 0 as in the step scans this replaces
+   center = (knots < xCenter[:,None]).sum( axis=1 )[:,None,None]
+   above = knotValues[:,None,:] > values[:,:,None]
+   change = above[:,:,1:] != above[:,:,:-1]
+   segments = np.arange( knots.shape[1]-1 )
+   lowSegment = np.where( change & (segments < center), segments, -1 ).max( axis=-1 )
+   highSegment = np.where( change & (segments >= center), segments, knots.shape[1] ).min( axis=-1 )
+
+   coefficients = None
+   if spline: coefficients = splineCoefficients( x, y )
+   for result,k,found in ((low,lowSegment,lowSegment >= 0),(high,highSegment,highSegment < knots.shape[1])):
+      g,v = np.nonzero( found )
+      k = k[ found ]
+      a,b = (knots[g,k],knots[g,k+1])
+      fa,fb = (knotValues[g,k]-values[g,v],knotValues[g,k+1]-values[g,v])
+      root = a - fa*(b-a)/(fb-fa)
+      if spline:
+         f = lambda t,g=g,v=v: splineAt( x, y, coefficients, g, t ) - values[g,v]
+         fa,fb = (f( a ),f( b ))
+         bracket = (fa > 0) != (fb > 0)
+         root = np.where( bracket, refineRoots( f, a, b, fa, fb ), root )
+      result[ g,v ] = root
+   return (low,high)
+
+
+def firstCrossings( x, d, xCenter ):
+   """ x are the sorted knots of a piecewise linear function with the
+   values d. Returns the indices (k,l) of the segments [x_k,x_k+1] with the
+   closest sign changes of d below and above xCenter (None if there is
+   none). "Sign" means d > 0 as in the step scans this replaces. """
+   c = np.searchsorted( x, xCenter )
+   above = d > 0
+   segments = np.nonzero( above[1:] != above[:-1] )[0]
+   below = segments[ segments < c ]
+   over = segments[ segments >= c ]
+   low,high = (None,None)
+   if len( below ): low = below[-1]
+   if len( over ): high = over[0]
+   return (low,high)
 
 
 
@@ -82,9 +295,10 @@ class Graph( ROOT.TGraph ):
           or
              x = [x1,x2,...]
              y = [y1,y2,...]
+          Lists and NumPy arrays are copied into the graph as doubles.
       """
 
-      if x == None:
+      if x is None:
          print( "WARNING: Tried to make graph of NULL object. Abort." )
          return
 
@@ -92,23 +306,23 @@ class Graph( ROOT.TGraph ):
          ROOT.TGraph.__init__( self, x )
       
       else:
-         if not y:
+         if y is None:
             # assume x is of the form: [ (x1,y1), (x2,y2), ... ]
             # --> split into xy
-            y = [i[1] for i in x]
-            x = [i[0] for i in x]
+            xy = doubles( x ).reshape( -1, 2 )
+            x,y = (xy[:,0],xy[:,1])
+         x,y = (doubles( x ),doubles( y ))
       
          if len(x) != len(y):
             print( "x and y have to have the same length." )
             return
             
-         # sort
+         # sort by x and then by y
          if sort:
-            xy = sorted( zip(x,y) )
-            x = [i for i,j in xy]
-            y = [j for i,j in xy]
+            order = np.lexsort( (y,x) )
+            x,y = (doubles( x[order] ),doubles( y[order] ))
    
-         ROOT.TGraph.__init__( self, len(x), array('f',x), array('f',y) )
+         ROOT.TGraph.__init__( self, len(x), x, y )
       
       
       if fillColor:
@@ -126,49 +340,27 @@ class Graph( ROOT.TGraph ):
       return r
 
    def scale( self, factor ):
-      for i in range( 0, self.GetN() ):
-         p = ( ROOT.Double(), ROOT.Double() )
-         self.GetPoint( i, p[0], p[1] )
-         self.SetPoint( i, p[0], p[1]*factor )
+      self.xyArrays()[1][:] *= factor
 
    def add( self, term ):
-      for i in range( 0, self.GetN() ):
-         p = ( ROOT.Double(), ROOT.Double() )
-         self.GetPoint( i, p[0], p[1] )
-         self.SetPoint( i, p[0], p[1]+term )
+      self.xyArrays()[1][:] += term
    
    def integral( self ):
       """ Calculate integral using trapezoidal rule. """
-      integral = 0.0
-      for i in range( 1, self.GetN() ):
-         previousPoint = ( ROOT.Double(), ROOT.Double() )
-         thisPoint = ( ROOT.Double(), ROOT.Double() )
-         self.GetPoint( i-1, previousPoint[0], previousPoint[1] )
-         self.GetPoint( i, thisPoint[0], thisPoint[1] )
-         
-         integral += (thisPoint[0]-previousPoint[0]) * (thisPoint[1]+previousPoint[1])/2.0
-      return integral
+      x,y = self.xyArrays()
+      return float( np.sum( np.diff(x) * (y[1:]+y[:-1])/2.0 ) )
       
    def argminX( self ):
       """ Get the minimum X. """
-      min = 1e30
-      minX = None
-      for i in range( 0, self.GetN() ):
-         p = ( ROOT.Double(), ROOT.Double() )
-         self.GetPoint( i, p[0], p[1] )
-         if p[1] < min:
-            min = p[1]
-            minX = p[0]
-      return minX
+      x,y = self.xyArrays()
+      if not len( y ) or y.min() >= 1e30: return None
+      return float( x[ np.argmin(y) ] )
       
    def argminY( self ):
       """ Get the minimum Y. """
-      min = 1e30
-      for i in range( 0, self.GetN() ):
-         p = ( ROOT.Double(), ROOT.Double() )
-         self.GetPoint( i, p[0], p[1] )
-         if p[1] < min: min = p[1]
-      return min
+      y = self.xyArrays()[1]
+      if not len( y ): return 1e30
+      return float( min( y.min(), 1e30 ) )
       
 
    def table( self, bandLow=None, bandHigh=None, bandDifference=True ):
@@ -189,77 +381,97 @@ class Graph( ROOT.TGraph ):
          
       return out
          
-   def getFirstIntersectionsWithGraph( self, otherGraph, xVar=None, xCenter=None, xRange=None, steps=1000 ):
-      """ xRange must be of the form (min,max) when given """
-      if xVar and not xRange: xRange = (xVar.getMin(), xVar.getMax())
-      if xVar and not xCenter: xCenter = xVar.getVal()
-      if not xRange: xRange = (self.GetRanges()[0], self.GetRanges()[2])
-      
-      low,high = (None,None)
-
-      #down
-      higher = self.Eval( xCenter ) > otherGraph.Eval( xCenter )
-      for i in range( steps+1 ):
-         #x = xRange[0]  +   float(i)*( xRange[1]-xRange[0] ) / steps
-         x = xCenter  -   float(i)*( xCenter-xRange[0] ) / steps
-         
-         newHigher = self.Eval( x ) > otherGraph.Eval( x )
-         if higher != newHigher:
-            low = x
-            break
-         higher = newHigher
-      #up
-      higher = self.Eval( xCenter ) > otherGraph.Eval( xCenter )
-      for i in range( steps+1 ):
-         #x = xRange[0]  +   float(i)*( xRange[1]-xRange[0] ) / steps
-         x = xCenter  +   float(i)*( xRange[1]-xCenter ) / steps
-         
-         newHigher = self.Eval( x ) > otherGraph.Eval( x )
-         if higher != newHigher:
-            high = x
-            break
-         higher = newHigher
-         
-      return (low,high)
-      
-   def getFirstIntersectionsWithValue( self, value, xVar=None, xCenter=None, xRange=None, steps=1000 ):
-      """ xRange must be of the form (min,max) when given """
+   def xyArrays( self ):
+      """ NumPy views of the x and y values of the graph. """
+      return graphArrays( self )
+
+   def sortedArrays( self ):
+      x,y = self.xyArrays()
+      order = np.argsort( x, kind="mergesort" )
+      return (x[order],y[order])
+
+   def evalArray( self, xs ):
+      """ Same as Eval() (linear interpolation and extrapolation) for an
+      array of x values. """
+      x,y = self.sortedArrays()
+      xs = np.asarray( xs, dtype=np.float64 )
+      if len( x ) < 2: return np.full( xs.shape, y[0] if len( y ) else 0.0 )
+      ys = np.interp( xs, x, y )
+      lowSlope = (y[1]-y[0])/(x[1]-x[0])
+      highSlope = (y[-1]-y[-2])/(x[-1]-x[-2])
+      ys = np.where( xs < x[0], y[0]+(xs-x[0])*lowSlope, ys )
+      ys = np.where( xs > x[-1], y[-1]+(xs-x[-1])*highSlope, ys )
+      return ys
+
+   def intersectionKnots( self, xCenter, xRange, otherGraph=None ):
+      """ All points in the range where the difference to a value or to the
+      other graph can change its slope. """
+      knots = [ self.xyArrays()[0], np.array( [xRange[0],xCenter,xRange[1]] ) ]
+      if otherGraph: knots.append( otherGraph.xyArrays()[0] )
+      knots = np.unique( np.concatenate( knots ) )
+      return knots[ (knots >= xRange[0]) & (knots <= xRange[1]) ]
+
+   def intersections( self, x, d, xCenter, f=None ):
+      """ Crossings of the piecewise linear difference d at the knots x
+      closest to xCenter. With the function f (the difference for a spline
+      interpolation, called with arrays), the crossing is refined within the
+      segment. """
+      crossings = []
+      for k in firstCrossings( x, d, xCenter ):
+         if k is None:
+            crossings.append( None )
+            continue
+         a,b = (x[k],x[k+1])
+         fa,fb = (d[k],d[k+1])
+         root = a - fa*(b-a)/(fb-fa)
+         if f:
+            fa,fb = (f(a),f(b))
+            if (fa > 0) != (fb > 0): root = refineRoots( f, a, b, fa, fb )
+         crossings.append( float(root) )
+      return tuple( crossings )
+
+   def rangeAndCenter( self, xVar, xCenter, xRange ):
       if xVar and not xRange: xRange = (xVar.getMin(), xVar.getMax())
-      if xVar and not xCenter: xCenter = xVar.getVal()
+      if xVar and xCenter is None: xCenter = xVar.getVal()
       if not xRange: xRange = (self.GetRanges()[0], self.GetRanges()[2])
+      return (xCenter,xRange)
+
+   def getFirstIntersectionsWithGraph( self, otherGraph, xVar=None, xCenter=None, xRange=None, steps=None, spline=False ):
+      """ xRange must be of the form (min,max) when given. Returns the
+      closest intersections (low,high) below and above xCenter. Both graphs
+      are linear between their points, so the intersections are exact. With
+      spline=True, this graph is interpolated with a cubic spline
+      instead. steps is not used anymore. """
+      xCenter,xRange = self.rangeAndCenter( xVar, xCenter, xRange )
+      x = self.intersectionKnots( xCenter, xRange, otherGraph )
+      d = self.evalArray( x ) - otherGraph.evalArray( x )
+      f = None
+      if spline:
+         xs,ys = self.sortedArrays()
+         coefficients = splineCoefficients( xs, ys )
+         xs,ys = (np.atleast_2d( xs ),np.atleast_2d( ys ))
+         f = lambda v: splineAt( xs, ys, coefficients, 0, v ) - otherGraph.evalArray( v )
+      return self.intersections( x, d, xCenter, f )
       
-      low,high = (None,None)
-
-      #down
-      higher = self.Eval( xCenter ) > value
-      for i in range( steps+1 ):
-         #x = xRange[0]  +   float(i)*( xRange[1]-xRange[0] ) / steps
-         x = xCenter  -   float(i)*( xCenter-xRange[0] ) / steps
-         
-         newHigher = self.Eval( x ) > value
-         if higher != newHigher:
-            low = x
-            break
-         higher = newHigher         
-      #up
-      higher = self.Eval( xCenter ) > value
-      for i in range( steps+1 ):
-         #x = xRange[0]  +   float(i)*( xRange[1]-xRange[0] ) / steps
-         x = xCenter  +   float(i)*( xRange[1]-xCenter ) / steps
-         
-         newHigher = self.Eval( x ) > value
-         if higher != newHigher:
-            high = x
-            break
-         higher = newHigher
-         
-      return (low,high)
+   def getIntersectionsWithValues( self, values, xVar=None, xCenter=None, xRange=None, spline=False ):
+      """ Returns a list of (low,high) for every value. See
+      intersectionsWithValues() for many graphs at once. """
+      xCenter,xRange = self.rangeAndCenter( xVar, xCenter, xRange )
+      x,y = self.sortedArrays()
+      low,high = intersectionsWithValues( x, y, values, xCenter, xRange[0], xRange[1], spline )
+      toFloat = lambda v: None if np.isnan( v ) else float( v )
+      return [ (toFloat( l ),toFloat( h )) for l,h in zip( low[0], high[0] ) ]
+
+   def getFirstIntersectionsWithValue( self, value, xVar=None, xCenter=None, xRange=None, steps=None, spline=False ):
+      """ xRange must be of the form (min,max) when given. Same as
+      getFirstIntersectionsWithGraph() for a constant. """
+      return self.getIntersectionsWithValues( [value], xVar, xCenter, xRange, spline )[0]
       
-   def getLatexIntervalFromNll( self, minX, up=0.5, xRange=None, steps=1000, digits=2 ):
+   def getLatexIntervalFromNll( self, minX, up=0.5, xRange=None, steps=None, digits=2, spline=False ):
       """ The parameter up is the same as in a Minos scan (0.5 for nll 
       and 68% two sided intervals). """
       
-      mInterval = self.getFirstIntersectionsWithValue( up, xCenter=minX, xRange=xRange, steps=steps )
+      mInterval = self.getFirstIntersectionsWithValue( up, xCenter=minX, xRange=xRange, spline=spline )
       fF = "%."+str(digits)+"f"   # float Format
       return ( (fF+"^{+"+fF+"}_{"+fF+"}") % (minX,mInterval[1]-minX,mInterval[0]-minX) )
       
@@ -277,23 +489,25 @@ class Band( ROOT.TGraph ):
          print( "x, yLow and yHigh have to have the same length." )
          return
          
-      if shiftBand:
-         yLow = [y+s for y,s in zip(yLow,shiftBand)]
-         yHigh = [y+s for y,s in zip(yHigh,shiftBand)]
+      x,yLow,yHigh = (doubles( x ),doubles( yLow ),doubles( yHigh ))
+      if shiftBand is not None:
+         yLow = yLow + doubles( shiftBand )
+         yHigh = yHigh + doubles( shiftBand )
          
       if style=="full":
-         band_values =  sorted([(v[0],v[1]) for v in zip(x,yLow)])
-         band_values += sorted([(v[0],v[1]) for v in zip(x,yHigh)], reverse=True)
-         ROOT.TGraph.__init__( self, len(band_values), array('f',[v[0] for v in band_values]), array('f',[v[1] for v in band_values]) )
+         # lower edge from left to right, upper edge back
+         low = np.lexsort( (yLow,x) )
+         high = np.lexsort( (yHigh,x) )[::-1]
+         bandX = doubles( np.concatenate( (x[low],x[high]) ) )
+         bandY = doubles( np.concatenate( (yLow[low],yHigh[high]) ) )
+         ROOT.TGraph.__init__( self, len(bandX), bandX, bandY )
          self.SetLineWidth(0)
          
       if style=="upperEdge":
-         band_values = [(v[0],v[1]) for v in zip(x,yHigh)]
-         ROOT.TGraph.__init__( self, len(band_values), array('f',[v[0] for v in band_values]), array('f',[v[1] for v in band_values]) )
+         ROOT.TGraph.__init__( self, len(x), x, yHigh )
       
       if style=="lowerEdge":
-         band_values = [(v[0],v[1]) for v in zip(x,yLow)]
-         ROOT.TGraph.__init__( self, len(band_values), array('f',[v[0] for v in band_values]), array('f',[v[1] for v in band_values]) )
+         ROOT.TGraph.__init__( self, len(x), x, yLow )
 
       if fillColor:
          self.SetFillColor( fillColor )
@@ -303,6 +517,10 @@ class Band( ROOT.TGraph ):
          self.SetLineStyle( lineStyle )
       if lineWidth:
          self.SetLineWidth( lineWidth )
+
+   def xyArrays( self ):
+      """ NumPy views of the x and y values of the band outline. """
+      return graphArrays( self )
       
       
 
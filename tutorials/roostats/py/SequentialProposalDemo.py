@@ -7,6 +7,7 @@ __version__ = "0.1"
 
 
 import optparse
+import helperSeeds
 parser = optparse.OptionParser(version="0.1")
 parser.add_option("-i", "--input", help="root file", type="string", dest="input", default="results/example_combined_GaussExample_model.root")
 parser.add_option("-o", "--output", help="output location", type="string", dest="output", default="docImages/")
@@ -16,6 +17,7 @@ parser.add_option("-m", "--mcName", help="ModelConfig name", type="string", dest
 parser.add_option("-d", "--dataName", help="data name", type="string", dest="dataName", default="obsData")
 
 parser.add_option("-f", "--fullRun", help="Do a full run.", dest="fullRun", default=False, action="store_true")
+helperSeeds.addOptionsToOptParse( parser )
 
 parser.add_option("-q", "--quiet", dest="verbose", action="store_false", default=True, help="Quiet output.")
 options,args = parser.parse_args()
@@ -26,28 +28,26 @@ ROOT.gROOT.SetBatch( True )
 import helperStyle
 
 import PyROOTUtils
+import helperContours
 import math
-from array import array
 
 
 
-def getContours( hist, level, canvas ):
-   hist.SetContour( 1, array('d',[level]) )
-   hist.Draw( "CONT LIST" )
-   canvas.Update()
-   listOfGraphs = ROOT.gROOT.GetListOfSpecials().FindObject("contours").At(0)
-   contours = [ ROOT.TGraph( listOfGraphs.At(i) ) for i in range( listOfGraphs.GetSize() ) ]
-   for co in range( len(contours) ):
-      contours[co].SetLineWidth( 2 )
-      contours[co].SetLineColor( ROOT.kBlue )
-      contours[co].SetName( "Contour%.0fTG_%d" % (level*100,co) )
+def getContours( hist, levels ):
+   """ Returns a list of contour graphs for every level. """
+   contours = helperContours.contours( hist, levels )
+   for level,graphs in zip( levels, contours ):
+      for co in range( len(graphs) ):
+         graphs[co].SetLineWidth( 2 )
+         graphs[co].SetLineColor( ROOT.kBlue )
+         graphs[co].SetName( "Contour%.0fTG_%d" % (level*100,co) )
    return contours
 
 
 
 def main():
    
-   ROOT.RooRandom.randomGenerator().SetSeed( 0 )
+   helperSeeds.setSeed( helperSeeds.campaignSeed( options ), "main" )
    
    file = ROOT.TFile.Open(options.input)
    if not file:
@@ -116,6 +116,8 @@ def main():
    for pF in proposalFunctions:
       print( "\n\n---------- "+pF["title"]+" ----------------" )
       mcmc.SetProposalFunction( pF["proposal"] )
+      # every chain has its own stream, also with --fullRun
+      helperSeeds.setSeed( options.seed, "mcmc", pF["id"] )
       interval = mcmc.GetInterval()
       interval.SetNumBurnInForFractionOfEntries( 0.3 )
       #interval.SetNumBurnInForNumEntries( 10000 )
@@ -168,16 +170,14 @@ def main():
          c3.cd( i*5 + 4 )
          h1 = plot.GetMinNLLHist2D( firstPOI, listNuisPars.at(i) )
          cont.append( h1 )
-         cont68Profile = getContours( h1, 2.3/2.0, c3 )
-         cont95Profile = getContours( h1, 6.0/2.0, c3 )
+         cont68Profile,cont95Profile = getContours( h1, [2.3/2.0, 6.0/2.0] )
          cont.append( cont68Profile+cont95Profile )
 
          h5 = plot.GetHist2D( firstPOI, listNuisPars.at(i) )
          h5.SetTitle( "Comparison of Posterior Contours (red) and NLL Contours (blue)" )
          h5.GetZaxis().SetTitle( "Posterior Contours (red) / NLL Contours (blue)" )
          cont.append( h5 )
-         cont68Marginalized = getContours( h5, plot.ContourLevel(h5,0.68), c3 )
-         cont95Marginalized = getContours( h5, plot.ContourLevel(h5,0.95), c3 )
+         cont68Marginalized,cont95Marginalized = getContours( h5, [plot.ContourLevel(h5,0.68), plot.ContourLevel(h5,0.95)] )
          cont.append( cont68Marginalized+cont95Marginalized )
 
          for c in cont68Profile:
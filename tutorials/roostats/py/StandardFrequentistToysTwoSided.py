@@ -18,11 +18,29 @@ __version__ = "0.1"
 
 import optparse
 import helperModifyModelConfig
+import helperSeeds
 
 parser = optparse.OptionParser(version="0.1")
 helperModifyModelConfig.addOptionsToOptParse( parser )
+helperSeeds.addOptionsToOptParse( parser )
 parser.add_option("-n", "--nToys", help="number of toys", type="int", dest="nToys", default=1)
+parser.add_option(      "--targetPrecision", help="Sequential mode: generate toys in batches of --nToys until the relative uncertainty of the null p-value is below this value.", type="float", dest="targetPrecision", default=0.0 )
+parser.add_option(      "--maxToys", help="Sequential mode: stop after this many toys even if the target precision is not reached. Default is 100 batches.", type="int", dest="maxToys", default=None )
+parser.add_option(      "--toysInTail", help="Continue every batch until it has this many toys in the right tail beyond the observed test statistic (adaptive sampling of the FrequentistCalculator).", type="int", dest="toysInTail", default=0 )
 parser.add_option(      "--proof", help="enable parallel proof processing: use \"\" for local proof-lite", dest="proof", default=None )
+parser.add_option(      "--chunkSize", help="Write the toys to disk in chunks of this many toys as they are generated (in <output>_chunks/) and merge the chunks at the end.", type="int", dest="chunkSize", default=0 )
+parser.add_option(      "--firstToy", help="Index of the first toy of this job in the campaign. Every chunk is seeded with the campaign seed and the index of its first toy, so jobs with the same --seed and --chunkSize produce the same toys however the campaign is split.", type="int", dest="firstToy", default=0 )
+parser.add_option(      "--resume", help="Keep the chunks of a previous run that was killed and only generate the missing chunks.", dest="resume", default=False, action="store_true" )
+parser.add_option(      "--mergeChunks", help="Do not generate toys. Only merge the chunks of a previous run into the output file.", dest="mergeChunks", default=False, action="store_true" )
+parser.add_option(      "--keepChunks", help="Do not remove the chunks after they were merged.", dest="keepChunks", default=False, action="store_true" )
+parser.add_option(      "--workers", help="Split the chunks of toys over this many local processes. Requires --chunkSize. Each chunk has its own ToyMCSampler and random seed. The results are merged.", type="int", dest="workers", default=1 )
+parser.add_option(      "--asymptotic", help="Use the asymptotic formulae with the Asimov dataset instead of toys. The alternative for the Asimov dataset is the best fit to the data or the POIs of --addSimpleLikelihoodRatioTestStat.", dest="asymptotic", default=False, action="store_true" )
+parser.add_option(      "--validationToys", help="With --asymptotic, run this many toys as a cross-check when the asymptotic formulae are questionable: few events (see --lowCounts) or a tested or fitted POI value within one standard deviation of the POI range boundary. The toys are written to <output>_validation.root .", type="int", dest="validationToys", default=0 )
+parser.add_option(      "--lowCounts", help="With --validationToys, a dataset with fewer events than this is considered to have low counts.", type="float", dest="lowCounts", default=25.0 )
+parser.add_option(      "--importanceSampling", help="Generate the toys from importance densities with the first POI shifted from its null value towards the best fit to the data and reweight them to the null distribution. This populates the far tail of the null distribution with few toys. Implies --detailedOutput, which gets the densityLabel of every toy.", dest="importanceSampling", default=False, action="store_true" )
+parser.add_option(      "--impDensities", help="Number of importance densities. Default (0) is to choose the number adaptively such that neighbouring densities overlap by --impOverlap standard deviations.", type="int", dest="impDensities", default=0 )
+parser.add_option(      "--impOverlap", help="Overlap of neighbouring importance densities in standard deviations of the POI.", type="float", dest="impOverlap", default=0.5 )
+parser.add_option(      "--bootstrap", help="Number of bootstrap replicas for the uncertainty bands of the quantiles of the null distribution. Use 0 to disable.", type="int", dest="bootstrap", default=100 )
 parser.add_option(      "--detailedOutput", help="enable detailed output", dest="detailedOutput", default=False, action="store_true" )
 parser.add_option(      "--addSimpleLikelihoodRatioTestStat", help="add SLRTS with defined POIs for the alt hypothesis. Example: \"mu=1,mH=126\"", dest="addSimpleLikelihoodRatioTestStat", default=False )
 
@@ -34,46 +52,71 @@ parser.add_option("-q", "--quiet", dest="verbose", action="store_false", default
 
 
 import ROOT
-import math
-
-
-
-def main():
-   ROOT.RooRandom.randomGenerator().SetSeed( 0 )
-
-   f = ROOT.TFile.Open( options.fileName )
-   w = f.Get( options.wsName )
-   mc = w.obj( options.mcName )
-   data = w.data( options.dataName )
-
-   helperModifyModelConfig.apply( options, w, mc )
-   
-
-   poiL = ROOT.RooArgList( mc.GetParametersOfInterest() )
-
+import math, os
+import helperSamplingDistribution
+
+
+
+def prepareAltModel( w, mc ):
+   """ ModelConfig with the POI values for the SimpleLikelihoodRatioTestStat. """
+   mcAlt = mc.Clone( "ModelConfigAlt" )
+   print( "" )
+   print( "=== Creating mcAlt ===" )
+   pvs = options.addSimpleLikelihoodRatioTestStat.split(",")
+   for pv in pvs:
+      name,value = pv.split("=")
+      print( "Setting "+name+"="+value+"." )
+      w.var( name ).setVal( float(value) )
+   mcAlt.SetSnapshot( mcAlt.GetParametersOfInterest() )
+   mcAlt.Print()
+   return mcAlt
+
+
+def bestFitPOI( mc, data ):
+   """ Value and error of the first POI at the unconditional best fit to the
+   data. All parameters are restored afterwards. """
+   params = mc.GetPdf().getParameters( data )
+   snapshot = params.snapshot()
+   poi = mc.GetParametersOfInterest().first()
+   wasConstant = poi.isConstant()
+   poi.setConstant( False )
+   constrain = ROOT.RooFit.Constrain( mc.GetNuisanceParameters() ) if mc.GetNuisanceParameters() else ROOT.RooCmdArg.none()
+   mc.GetPdf().fitTo( data, constrain, ROOT.RooFit.PrintLevel( -1 ) )
+   poiHat,poiHatErr = (poi.getVal(),poi.getError())
+   params.assignValueOnly( snapshot )
+   poi.setConstant( wasConstant )
+   return (poiHat,poiHatErr)
+
+def createImportanceDensities( toymcs, mc, poiHat ):
+   """ Adds importance densities to the ToyMCImportanceSampler. They are
+   the model pdf with the first POI between its null value and poiHat.
+   Returns the number of densities. """
+   poi = mc.GetParametersOfInterest().first()
+   nullValue = poi.getVal()
+   # the densities are created up to the current value of the POI
+   poi.setVal( poiHat )
+   if options.impDensities > 0:
+      n = toymcs.CreateNImpDensitiesForOnePOI( mc.GetPdf(), mc.GetParametersOfInterest(), poi, options.impDensities, nullValue )
+   else:
+      n = toymcs.CreateImpDensitiesForOnePOIAdaptively( mc.GetPdf(), mc.GetParametersOfInterest(), poi, options.impOverlap, nullValue )
+   poi.setVal( nullValue )
+   return n
+
+def setupCalculator( w, mc, data, mcAlt, varName, poiHat=None ):
+   """ Creates the test statistics, the ToyMCSampler and the
+   FrequentistCalculator. Returns all of them, because the calculator does
+   not own the others. With poiHat, the sampler is a
+   ToyMCImportanceSampler with densities up to that POI value. """
 
    # ----------------------------------------------------
    # Configure a ProfileLikelihoodTestStat to use with ToyMCSampler
    plts = ROOT.RooStats.ProfileLikelihoodTestStat( mc.GetPdf() )
    #plts.SetOneSidedDiscovery( True )
-   plts.SetVarName( "q_{"  +  ",".join([poiL.at(p).GetName()+"="+str(poiL.at(p).getVal()) for p in range( poiL.getSize() )])  +  "}/2" )
+   plts.SetVarName( varName )
    if options.detailedOutput: plts.EnableDetailedOutput( True )
    
    slrts = None
-   if options.addSimpleLikelihoodRatioTestStat:
-      
-      # prepare mcAlt first
-      mcAlt = mc.Clone( "ModelConfigAlt" )
-      print( "" )
-      print( "=== Creating mcAlt ===" )
-      pvs = options.addSimpleLikelihoodRatioTestStat.split(",")
-      for pv in pvs:
-         name,value = pv.split("=")
-         print( "Setting "+name+"="+value+"." )
-         w.var( name ).setVal( float(value) )
-      mcAlt.SetSnapshot( mcAlt.GetParametersOfInterest() )
-      mcAlt.Print()
-   
+   if mcAlt:
       slrts = ROOT.RooStats.SimpleLikelihoodRatioTestStat( mc.GetPdf(), mc.GetPdf() )
       slrts.SetNullParameters( mc.GetSnapshot() )
       slrts.SetAltParameters( mcAlt.GetSnapshot() )
@@ -82,7 +125,12 @@ def main():
    
    # ----------------------------------------------------
    # configure the ToyMCSampler
-   toymcs = ROOT.RooStats.ToyMCSampler(plts, 50)
+   if poiHat is None:
+      toymcs = ROOT.RooStats.ToyMCSampler(plts, 50)
+   else:
+      toymcs = ROOT.RooStats.ToyMCImportanceSampler(plts, 50)
+      if createImportanceDensities( toymcs, mc, poiHat ) == 0:
+         print( "WARNING: No importance densities were created. The toys are generated from the null." )
    if slrts: toymcs.AddTestStatistic( slrts )
 
    #    // Since this tool needs to throw toy MC the PDF needs to be
@@ -107,19 +155,304 @@ def main():
 
    # instantiate the calculator
    freqCalc = ROOT.RooStats.FrequentistCalculator(data, mc, mc, toymcs)
-   freqCalc.SetToys( options.nToys,0 ) # null toys, alt toys
+   return (freqCalc,toymcs,plts,slrts)
+
+
+def writeResult( result, fileName, values=None ):
+   """ Writes the result and optionally a dictionary of further values as
+   constant RooRealVars to the workspace "ToysOutput". """
+   ows = ROOT.RooWorkspace( "ToysOutput" )
+   getattr(ows,"import")( result )
+   if values:
+      for name in sorted( values.keys() ):
+         getattr(ows,"import")( ROOT.RooRealVar( name, name, values[name] ) )
+   print( "Writing file: "+fileName )
+   ows.writeToFile( fileName, True )
+
+def readResult( fileName ):
+   f = ROOT.TFile.Open( fileName )
+   result = ROOT.RooStats.HypoTestResult( f.Get( "ToysOutput" ).obj( "HypoTestCalculator_result" ) )
+   f.Close()
+   return result
+
+
+# (w,mc,data,mcAlt,varName,poiHat) for the worker processes
+toyContext = None
+
+def runToys( nToys, toysInTail=0, maxToys=0 ):
+   """ Runs nToys null toys with a new calculator. With toysInTail, toys are
+   generated until that many are in the right tail, but at most maxToys.
+   Returns the HypoTestResult. """
+   calculator = setupCalculator( *toyContext )
+   freqCalc,toymcs = calculator[:2]
+   freqCalc.SetToys( nToys,0 ) # null toys, alt toys
+   if toysInTail:
+      # the calculator calls SetToysRightTail() on the ToyMCSampler
+      freqCalc.SetNToysInTails( toysInTail,0 )
+      if maxToys: toymcs.SetMaxToys( max( maxToys, nToys ) )
+   return freqCalc.GetHypoTest()
+
+def chunkDir():
+   return os.path.splitext( options.output )[0]+"_chunks"
+
+def chunkName( first, nToys ):
+   # zero padded, so that sorting the names sorts the chunks by first toy
+   return os.path.join( chunkDir(), "chunk_%09d_%d.root" % (first,nToys) )
+
+def existingChunks():
+   """ Returns the chunk files in the chunk directory ordered by their first
+   toy and the number of toys in them. """
+   if not os.path.isdir( chunkDir() ): return ([],0)
+   fileNames = sorted( [
+      os.path.join( chunkDir(), f ) for f in os.listdir( chunkDir() )
+      if f.startswith( "chunk_" ) and f.endswith( ".root" )
+   ] )
+   nToys = 0
+   for fileName in fileNames:
+      nToys += readResult( fileName ).GetNullDistribution().GetSize()
+   return (fileNames,nToys)
+
+def splitEvenly( n, parts ):
+   return [ n//parts + (1 if i < n % parts else 0) for i in range(parts) ]
+
+def toyWorker( task ):
+   """ Generates one chunk of toys and writes it to its chunk file. The
+   stream of random numbers is determined by the campaign seed and the
+   index of the first toy of the chunk only. This runs in the worker
+   processes when --workers is used. Returns the file name. """
+   first,nToys,toysInTail,maxToys = task
+   fileName = chunkName( first, nToys )
+   helperSeeds.setSeed( options.seed, "toys", first )
+   # a chunk file only appears when it is complete
+   writeResult( runToys( nToys, toysInTail, maxToys ), fileName+".tmp" )
+   os.rename( fileName+".tmp", fileName )
+   return fileName
+
+def runChunks( first, nToys, workers, toysInTail=0, maxToys=0 ):
+   """ Generates the toys first to first+nToys in chunks of --chunkSize
+   toys in the worker processes. With --resume, chunks that exist already
+   are not generated again. Returns the list of chunk files ordered by
+   their first toy. """
+   if nToys <= 0: return []
+   if not os.path.isdir( chunkDir() ): os.makedirs( chunkDir() )
+   # --workers requires --chunkSize, so the chunks do not depend on the
+   # number of workers
+   chunkSize = options.chunkSize or nToys
+   starts = list( range( first, first+nToys, chunkSize ) )
+   tasks = [
+      (start,min( chunkSize, first+nToys-start ),tail,maxN) for start,tail,maxN in zip(
+         starts, splitEvenly( toysInTail, len(starts) ), splitEvenly( maxToys, len(starts) ),
+      )
+   ]
+   fileNames = [ chunkName( t[0], t[1] ) for t in tasks ]
+   if options.resume:
+      tasks = [ t for t in tasks if not os.path.exists( chunkName( t[0], t[1] ) ) ]
+      print( "Generating "+str(len(tasks))+" of "+str(len(fileNames))+" chunks." )
+   if workers <= 1 or len( tasks ) <= 1:
+      for t in tasks: toyWorker( t )
+      return fileNames
+
+   # fork after the model is loaded
+   import multiprocessing
+   pool = multiprocessing.Pool( min( workers, len(tasks) ) )
+   pool.map( toyWorker, tasks )
+   pool.close()
+   pool.join()
+   return fileNames
+
+def mergeChunks( fileNames ):
+   """ Appends the results in the chunk files including the detailed
+   output. """
+   result = None
+   for fileName in fileNames:
+      print( "Merging "+fileName )
+      partial = readResult( fileName )
+      if result: result.Append( partial )
+      else: result = partial
+   return result
+
+def nullPValueAndError( result ):
+   """ Null p-value of the right tail and its uncertainty, which also holds
+   for weighted toys (see helperSamplingDistribution.py). """
+   dist = helperSamplingDistribution.fromSamplingDistribution( result.GetNullDistribution() )
+   p,pErr = dist.pValuesAndErrors( [result.GetTestStatisticData()] )
+   return (p[0],pErr[0])
+
+def runSequential( chunks ):
+   """ Generates batches of toys until the null p-value has the target
+   relative precision or the toy budget is used up. The toys of a batch
+   continue the toy index of the previous batch, so a run that is resumed
+   makes the same decisions. New chunk files are added to chunks. Returns
+   the result. """
+   batchSize = options.nToys
+   maxToys = options.maxToys or 100*batchSize
+   result = None
+   first = options.firstToy
+   done = 0
+   nextBatch = batchSize
+   while done < maxToys:
+      nextBatch = min( nextBatch, maxToys-done )
+      tail,tailMax = (options.toysInTail,maxToys-done) if options.toysInTail else (0,0)
+      if options.workers > 1 or options.chunkSize > 0:
+         newChunks = runChunks( first, nextBatch, options.workers, tail, tailMax )
+         chunks += newChunks
+         batch = mergeChunks( newChunks )
+      else:
+         helperSeeds.setSeed( options.seed, "toys", first )
+         batch = runToys( nextBatch, tail, tailMax )
+      first += nextBatch
+      if result: result.Append( batch )
+      else: result = batch
+      done = result.GetNullDistribution().GetSize()
+
+      p,pErr = nullPValueAndError( result )
+      print( "Sequential: "+str(done)+" toys, p-value = "+str(p)+" +/- "+str(pErr) )
+      if p > 0.0 and pErr/p <= options.targetPrecision:
+         print( "Target precision reached." )
+         break
+
+      # toys needed for the target precision from (1-p)/(N p) = precision^2,
+      # but do not more than double the number of toys in one batch
+      nextBatch = batchSize
+      if p > 0.0:
+         needed = int( math.ceil( (1.0-p)/(p*options.targetPrecision**2) ) )
+         nextBatch = max( batchSize, min( needed-done, done ) )
+   else:
+      print( "WARNING: Toy budget of "+str(maxToys)+" toys used up before reaching the target precision." )
+   return result
+
+def asymptoticConcerns( data, poi, poiHat, poiHatErr ):
+   """ Reasons why the asymptotic formulae might not be adequate. """
+   reasons = []
+   if data.sumEntries() < options.lowCounts:
+      reasons.append( "low counts ("+str(data.sumEntries())+" events)" )
+   for name,value in [("tested",poi.getVal()),("fitted",poiHat)]:
+      if value-poi.getMin() < poiHatErr or poi.getMax()-value < poiHatErr:
+         reasons.append( name+" "+poi.GetName()+"="+str(value)+" near the boundary" )
+   return reasons
+
+def runAsymptotic( w, mc, data, mcAlt ):
+   """ Asymptotic two-sided test with the Asimov dataset of the alternative
+   model. Writes the result and the expected p-values to the output file,
+   and runs validation toys if the asymptotic formulae are questionable.
+   Returns the null p-value. """
+   poi = mc.GetParametersOfInterest().first()
+   poiHat,poiHatErr = bestFitPOI( mc, data )
+   if not mcAlt:
+      # the alternative is the best fit to the data
+      nullValue = poi.getVal()
+      mcAlt = mc.Clone( "ModelConfigAsimov" )
+      poi.setVal( poiHat )
+      mcAlt.SetSnapshot( mcAlt.GetParametersOfInterest() )
+      poi.setVal( nullValue )
+
+   asympCalc = ROOT.RooStats.AsymptoticCalculator( data, mcAlt, mc )
+   asympCalc.SetTwoSided()
+   result = asympCalc.GetHypoTest()
+   result.SetName( "HypoTestCalculator_result" )
+   result.Print()
+   pvalue = result.NullPValue()
+
+   # expected null p-values for the alternative: median and bands
+   expected = {}
+   for nSigma in (-2,-1,0,1,2):
+      name = "expectedPValue"
+      if nSigma: name += "_%s%d" % ("p" if nSigma > 0 else "m",abs(nSigma))
+      expected[ name ] = ROOT.RooStats.AsymptoticCalculator.GetExpectedPValues(
+         pvalue, result.AlternatePValue(), nSigma, False, False
+      )
+   expected[ "poiHat" ] = poiHat
+   writeResult( result, options.output, expected )
+
+   print( "Two-sided obs asymptotic p-value = "+str(pvalue)+", significance = "+str(ROOT.RooStats.PValueToSignificance( pvalue/2 )) )
+   for name in sorted( expected.keys() ): print( name+" = "+str(expected[name]) )
+
+   if options.validationToys > 0:
+      reasons = asymptoticConcerns( data, poi, poiHat, poiHatErr )
+      if not reasons:
+         print( "No validation toys needed." )
+         return pvalue
+      print( "Running "+str(options.validationToys)+" validation toys: "+", ".join( reasons ) )
+      helperSeeds.setSeed( options.seed, "validation" )
+      toyResult = runToys( options.validationToys )
+      writeResult( toyResult, os.path.splitext( options.output )[0]+"_validation.root" )
+      p,pErr = nullPValueAndError( toyResult )
+      print( "Toy p-value = "+str(p)+" +/- "+str(pErr)+", asymptotic p-value = "+str(pvalue) )
+      if pErr > 0.0 and abs( p-pvalue ) > 3.0*pErr:
+         print( "WARNING: Asymptotic and toy p-values differ by more than 3 standard deviations." )
+   return pvalue
+
+def removeChunks( fileNames ):
+   for fileName in fileNames: os.remove( fileName )
+   if not os.listdir( chunkDir() ): os.rmdir( chunkDir() )
+
+
+
+def main():
+   global toyContext
+   helperSeeds.setSeed( helperSeeds.campaignSeed( options ), "main" )
+
+   f = ROOT.TFile.Open( options.input )
+   w = f.Get( options.wsName )
+   mc = w.obj( options.mcName )
+   data = w.data( options.dataName )
+
+   helperModifyModelConfig.apply( options, w, mc )
+   
+
+   poiL = ROOT.RooArgList( mc.GetParametersOfInterest() )
+   varName = "q_{"  +  ",".join([poiL.at(p).GetName()+"="+str(poiL.at(p).getVal()) for p in range( poiL.getSize() )])  +  "}/2"
+
+   mcAlt = None
+   if options.addSimpleLikelihoodRatioTestStat: mcAlt = prepareAltModel( w, mc )
+   poiHat = None
+   if options.importanceSampling:
+      if options.toysInTail:
+         print( "ERROR: --toysInTail cannot be used with --importanceSampling." )
+         return
+      if poiL.getSize() > 1:
+         print( "Importance densities are shifted in "+poiL.at(0).GetName()+" only." )
+      options.detailedOutput = True
+      poiHat = bestFitPOI( mc, data )[0]
+      print( "Importance densities between "+poiL.at(0).GetName()+"="+str(poiL.at(0).getVal())+" and the best fit "+str(poiHat) )
+   toyContext = (w,mc,data,mcAlt,varName,poiHat)
+
+   if options.workers > 1 and options.proof is not None:
+      print( "ERROR: Use either --workers or --proof." )
+      return
+   if options.workers > 1 and options.chunkSize <= 0:
+      print( "ERROR: --workers requires --chunkSize. The toys are seeded per chunk, so the chunks must not depend on the number of workers." )
+      return
+   if options.chunkSize > 0 and options.firstToy % options.chunkSize:
+      print( "WARNING: --firstToy is not a multiple of --chunkSize. The toys of this job will not match those of a job with a different split." )
+
+   if options.asymptotic:
+      return runAsymptotic( w, mc, data, mcAlt )
 
    # Run the calculator and print result
-   freqCalcResult = freqCalc.GetHypoTest()
+   chunks = []
+   if options.mergeChunks:
+      chunks,nToys = existingChunks()
+      if not chunks:
+         print( "ERROR: No chunks found in "+chunkDir() )
+         return
+      print( "Merging "+str(nToys)+" toys in "+str(len(chunks))+" chunks from "+chunkDir() )
+      freqCalcResult = mergeChunks( chunks )
+   elif options.targetPrecision > 0.0:
+      freqCalcResult = runSequential( chunks )
+   elif options.workers > 1 or options.chunkSize > 0:
+      chunks = runChunks( options.firstToy, options.nToys, options.workers, options.toysInTail, options.maxToys or 0 )
+      freqCalcResult = mergeChunks( chunks )
+   else:
+      helperSeeds.setSeed( options.seed, "toys", options.firstToy )
+      freqCalcResult = runToys( options.nToys, options.toysInTail, options.maxToys or 0 )
    freqCalcResult.GetNullDistribution().SetTitle( "toys" )
    #freqCalcResult->GetAltDistribution()->SetTitle( "s+b" )
    freqCalcResult.Print()
    pvalue = freqCalcResult.NullPValue()
    
-   ows = ROOT.RooWorkspace( "ToysOutput" )
-   getattr(ows,"import")( freqCalcResult )
-   print( "Writing file: "+options.output )
-   ows.writeToFile( options.output, True )
+   writeResult( freqCalcResult, options.output )
+   if chunks and not options.keepChunks: removeChunks( chunks )
    
 
    # plot
@@ -144,11 +477,20 @@ def main():
    print( "Asymptotic obs significance = "+str(math.sqrt(2.0*freqCalcResult.GetTestStatisticData())) )
    print( "Two-sided obs toy significance = "+str(ROOT.RooStats.PValueToSignificance( pvalue/2 )) )
 
-   print( "InverseCDF( 0.68 ) = "+str(freqCalcResult.GetNullDistribution().InverseCDF(0.68)) )
-   print( "InverseCDF( 0.84 ) = "+str(freqCalcResult.GetNullDistribution().InverseCDF(0.84)) )
-   print( "InverseCDF( 0.90 ) = "+str(freqCalcResult.GetNullDistribution().InverseCDF(0.90)) )
-   print( "InverseCDF( 0.95 ) = "+str(freqCalcResult.GetNullDistribution().InverseCDF(0.95)) )
-   print( "InverseCDF( 0.997 ) = "+str(freqCalcResult.GetNullDistribution().InverseCDF(0.997)) )
+   # all quantiles from one sorted copy of the null distribution, with the
+   # same indexing as SamplingDistribution::InverseCDF()
+   nullDist = helperSamplingDistribution.fromSamplingDistribution( freqCalcResult.GetNullDistribution() )
+   labels = ["0.68","0.84","0.90","0.95","0.997"]
+   probabilities = [ float(l) for l in labels ]
+   for l,q in zip( labels, nullDist.inverseCDF( probabilities ) ):
+      print( "InverseCDF( "+l+" ) = "+str(q) )
+   if options.bootstrap > 0:
+      low,high = nullDist.bootstrapBand(
+         lambda d: d.inverseCDF( probabilities ), options.bootstrap,
+         helperSeeds.streamSeed( options.seed, "bootstrap" ),
+      )
+      for l,lo,hi in zip( labels, low, high ):
+         print( "Bootstrap 68% band of InverseCDF( "+l+" ) = ["+str(lo)+", "+str(hi)+"]" )
    
 
 #    
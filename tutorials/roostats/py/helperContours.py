@@ -0,0 +1,151 @@
+
+#  Created on: February 5, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Contours of 2D histograms without drawing them. The contours are found with
+marching squares on the grid of bin centers and the crossing points are
+linearly interpolated between the bin centers. This does not need a canvas
+or the graphics stack, so it also works in batch jobs and worker processes.
+
+The contours are returned as PyROOTUtils.Graph objects. Closed contours end
+with their first point. Only the functions that read histograms or make
+graphs import PyROOTUtils (and ROOT), so the marching squares on arrays also
+work without ROOT.
+"""
+
+
+
+import numpy as np
+
+
+# element type of the bin array of the TH2 classes
+arrayTypes = [
+   ("TArrayD",np.float64), ("TArrayF",np.float32), ("TArrayI",np.int32),
+   ("TArrayS",np.int16), ("TArrayC",np.int8),
+]
+
+def axisCenters( axis ):
+   import PyROOTUtils
+   n = axis.GetNbins()
+   edges = axis.GetXbins()
+   if edges.GetSize(): edges = PyROOTUtils.bufferArray( edges.GetArray(), n+1 )
+   else: edges = np.linspace( axis.GetXmin(), axis.GetXmax(), n+1 )
+   return 0.5*(edges[:-1]+edges[1:])
+
+def histValues( hist ):
+   """ Returns (x,y,z) with the bin centers along x and y and the bin
+   contents as z[i,j] for the x bin i and the y bin j. The contents are
+   copied from the bin array of the histogram in one go. """
+   import PyROOTUtils
+   nX,nY = (hist.GetNbinsX(),hist.GetNbinsY())
+   dtype = [ t for c,t in arrayTypes if hist.InheritsFrom( c ) ][0]
+   # global bin numbers run fastest along x
+   contents = PyROOTUtils.bufferArray( hist.GetArray(), (nX+2)*(nY+2), dtype ).reshape( (nX+2,nY+2), order='F' )
+   z = contents[1:nX+1,1:nY+1].astype( np.float64 )
+   return (axisCenters( hist.GetXaxis() ),axisCenters( hist.GetYaxis() ),z)
+
+
+# The corners of a cell are numbered counter-clockwise starting bottom left,
+# the edges are bottom, right, top and left. An edge is identified across
+# cells by its direction and its lower left grid point.
+cornerOffsets = [ (0,0), (1,0), (1,1), (0,1) ]
+edgeCorners = [ (0,1), (1,2), (3,2), (0,3) ]
+# the two edges of a cell around a corner, used for the saddle points
+cornerEdges = [ (0,3), (0,1), (1,2), (2,3) ]
+
+def edgeKey( i, j, e ):
+   if e == 0: return ('h',i,j)
+   if e == 1: return ('v',i+1,j)
+   if e == 2: return ('h',i,j+1)
+   return ('v',i,j)
+
+
+def contourSegments( x, y, z, level ):
+   """ Returns the crossing points {edgeKey:(x,y)} and the list of segments
+   as pairs of edge keys. z is indexed as z[i,j]. """
+   z = np.asarray( z, dtype=np.float64 )
+   # only the cells with finite corners on both sides of the level are
+   # visited in Python
+   finite = np.isfinite( z )
+   isAbove = (z >= level).astype( np.int64 )
+   cellFinite = finite[:-1,:-1] & finite[1:,:-1] & finite[1:,1:] & finite[:-1,1:]
+   cellAbove = isAbove[:-1,:-1] + isAbove[1:,:-1] + isAbove[1:,1:] + isAbove[:-1,1:]
+   cells = np.argwhere( cellFinite & (cellAbove > 0) & (cellAbove < 4) ).tolist()
+   x,y,z = (list( x ),list( y ),z.tolist())
+
+   points = {}
+   segments = []
+   for i,j in cells:
+      corners = [ (i+di,j+dj) for di,dj in cornerOffsets ]
+      v = [ z[ci][cj] for ci,cj in corners ]
+      above = [ c >= level for c in v ]
+      crossed = [ e for e,(a,b) in enumerate( edgeCorners ) if above[a] != above[b] ]
+
+      for e in crossed:
+         key = edgeKey( i, j, e )
+         if key in points: continue
+         a,b = edgeCorners[e]
+         t = (level-v[a])/(v[b]-v[a])
+         (ai,aj),(bi,bj) = (corners[a],corners[b])
+         points[ key ] = ( x[ai]+t*(x[bi]-x[ai]), y[aj]+t*(y[bj]-y[aj]) )
+
+      if len( crossed ) == 2:
+         segments.append( (edgeKey( i,j,crossed[0] ), edgeKey( i,j,crossed[1] )) )
+      else:
+         # saddle point: the center decides which corners are connected;
+         # cut off the corners that are on the other side than the center
+         center = sum( v )/4.0 >= level
+         for c in range( 4 ):
+            if above[c] != center:
+               segments.append( (edgeKey( i,j,cornerEdges[c][0] ), edgeKey( i,j,cornerEdges[c][1] )) )
+   return (points,segments)
+
+
+def stitch( segments ):
+   """ Joins segments into lists of edge keys. Open contours (ending at the
+   boundary) come first. """
+   neighbours = {}
+   for a,b in segments:
+      neighbours.setdefault( a, [] ).append( b )
+      neighbours.setdefault( b, [] ).append( a )
+
+   lines = []
+   used = set()
+   def walk( start ):
+      line = [ start ]
+      used.add( start )
+      current = start
+      while True:
+         nextKeys = [ n for n in neighbours[ current ] if n not in used ]
+         if not nextKeys: break
+         current = nextKeys[0]
+         used.add( current )
+         line.append( current )
+      # close loops
+      if len( line ) > 2 and start in neighbours[ current ]: line.append( start )
+      return line
+
+   starts = [ k for k,n in neighbours.items() if len( n ) == 1 ]
+   for k in sorted( starts )+sorted( neighbours.keys() ):
+      if k not in used: lines.append( walk( k ) )
+   return lines
+
+
+def contours( hist, levels ):
+   """ Returns a list of contour graphs for every level. """
+   import PyROOTUtils
+   x,y,z = histValues( hist )
+   allContours = []
+   for level in levels:
+      points,segments = contourSegments( x, y, z, level )
+      graphs = []
+      for line in stitch( segments ):
+         graphs.append( PyROOTUtils.Graph(
+            [ points[k][0] for k in line ],
+            [ points[k][1] for k in line ],
+            sort=False,
+         ) )
+      allContours.append( graphs )
+   return allContours
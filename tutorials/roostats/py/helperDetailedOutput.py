@@ -0,0 +1,160 @@
+
+#  Created on: February 20, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Columnar access to the detailed output of a HypoTestResult. The RooDataSet
+is read once into NumPy arrays: one float64 array per real variable, the
+weights and the index of every category (for example densityLabel). The
+columns are drawn from the TTree of the tree data store with TTree::Draw()
+and copied in bulk, so there is no Python loop over the entries. All
+histograms are then binned from these arrays. Grouping by a category is one
+bincount over combined (category,bin) indices instead of one pass over the
+dataset per category.
+
+Bins follow the ROOT convention with underflow and overflow bins, so the
+contents can be set directly on ROOT histograms.
+"""
+
+
+
+import ROOT
+import numpy as np
+
+import PyROOTUtils
+from helperProfileHist import binIndices
+
+
+def dataSetTree( dataSet ):
+   """ TTree of the data store. Datasets with another store are converted
+   to a tree store (in place). """
+   if not dataSet.store().InheritsFrom( "RooTreeDataStore" ):
+      dataSet.convertToTreeStore()
+   return dataSet.store().tree()
+
+def weightBranch( dataSet, tree, branches ):
+   """ Name of the branch with the event weights of a weighted dataset. This
+   is the weight variable, or else the one branch of the tree that belongs
+   to none of the variables (or their errors). """
+   if hasattr( dataSet, "weightVar" ) and dataSet.weightVar():
+      return dataSet.weightVar().cleanBranchName().Data()
+   errors = ("_err","_aerr_lo","_aerr_hi")
+   others = [
+      b.GetName() for b in tree.GetListOfBranches()
+      if b.GetName() not in branches and not b.GetName().endswith( errors )
+   ]
+   if len( others ) != 1:
+      raise ValueError( "Cannot find the weight branch of "+dataSet.GetName()+" among "+str(others) )
+   return others[0]
+
+
+class DetailedOutput:
+   def __init__( self, dataSet ):
+      row = dataSet.get()
+      args = ROOT.RooArgList( row )
+      self.names = []
+      self.categoryNames = []
+      reals = []
+      categories = []
+      for i in range( args.getSize() ):
+         arg = args.at(i)
+         if arg.InheritsFrom( "RooAbsCategory" ):
+            self.categoryNames.append( arg.GetName() )
+            categories.append( arg )
+         else:
+            self.names.append( arg.GetName() )
+            reals.append( arg )
+
+      # branch names as in RooTreeDataStore: categories store their index
+      tree = dataSetTree( dataSet )
+      branches = [ r.cleanBranchName().Data() for r in reals ]
+      branches += [ c.cleanBranchName().Data()+"_idx" for c in categories ]
+      if dataSet.isWeighted(): branches.append( weightBranch( dataSet, tree, branches ) )
+      columns = PyROOTUtils.treeColumns( tree, branches )[0]
+
+      self.columns = dict( zip( self.names, columns[:len(reals)] ) )
+      self.categories = dict(
+         (name,np.rint( c ).astype( np.int64 ))
+         for name,c in zip( self.categoryNames, columns[len(reals):len(reals)+len(categories)] )
+      )
+      if dataSet.isWeighted(): self.weights = columns[-1]
+      else: self.weights = np.ones( tree.GetEntries() )
+
+      # index -> label of every category
+      self.labels = {}
+      for c in categories:
+         labels = {}
+         it = c.typeIterator()
+         t = it.Next()
+         while t:
+            labels[ t.getVal() ] = t.GetName()
+            t = it.Next()
+         self.labels[ c.GetName() ] = labels
+
+   def size( self ):
+      return len( self.weights )
+
+   def range( self, name ):
+      """ Smallest and largest value like RooDataSet::getRange(). """
+      values = self.columns[ name ]
+      if not len( values ): return (0.0,0.0)
+      return (values.min(),values.max())
+
+   def binned( self, name, bins, low, high, groupBy=None ):
+      """ Sums of the weights in the bins including underflow and overflow.
+      With groupBy (a category name), returns (groups,contents) with the
+      category indices and one row of contents per index, from a single
+      bincount. """
+      idx = binIndices( self.columns[ name ], bins, low, high )
+      if groupBy is None:
+         return np.bincount( idx, weights=self.weights, minlength=bins+2 )
+
+      groups = sorted( self.labels[ groupBy ].keys() )
+      position = np.searchsorted( groups, self.categories[ groupBy ] )
+      flat = position*(bins+2) + idx
+      contents = np.bincount( flat, weights=self.weights, minlength=len(groups)*(bins+2) )
+      return (groups,contents.reshape( (len(groups),bins+2) ))
+
+   def binned2D( self, nameX, binsX, lowX, highX, nameY, binsY, lowY, highY ):
+      """ 2D sums of the weights as an array [x bin, y bin] including
+      underflow and overflow bins. """
+      ix = binIndices( self.columns[ nameX ], binsX, lowX, highX )
+      iy = binIndices( self.columns[ nameY ], binsY, lowY, highY )
+      shape = (binsX+2,binsY+2)
+      contents = np.bincount( np.ravel_multi_index( (ix,iy), shape ), weights=self.weights, minlength=shape[0]*shape[1] )
+      return contents.reshape( shape )
+
+   def correlationMatrix( self, names ):
+      """ Weighted correlation matrix like RooDataSet::correlationMatrix()
+      as a TMatrixDSym. """
+      cov = np.atleast_2d( np.cov( np.array( [self.columns[n] for n in names] ), aweights=self.weights ) )
+      sigma = np.sqrt( np.diag( cov ) )
+      corr = cov/np.outer( sigma, sigma )
+      matrix = ROOT.TMatrixDSym( len(names) )
+      for i in range( len(names) ):
+         for j in range( len(names) ): matrix[i][j] = corr[i,j]
+      return matrix
+
+   def samplingDistribution( self, name ):
+      """ RooStats::SamplingDistribution of one variable with the weights. """
+      values = ROOT.std.vector('double')( self.size() )
+      weights = ROOT.std.vector('double')( self.size() )
+      if self.size():
+         PyROOTUtils.bufferArray( values.data(), self.size() )[:] = self.columns[ name ]
+         PyROOTUtils.bufferArray( weights.data(), self.size() )[:] = self.weights
+      return ROOT.RooStats.SamplingDistribution( name, name, values, weights, name )
+
+
+def toTH1F( name, title, contents, bins, low, high ):
+   h = ROOT.TH1F( name, title, bins, low, high )
+   h.SetContent( PyROOTUtils.doubles( contents ) )
+   h.SetEntries( contents.sum() )
+   return h
+
+def toTH2F( name, title, contents, binsX, lowX, highX, binsY, lowY, highY ):
+   h = ROOT.TH2F( name, title, binsX, lowX, highX, binsY, lowY, highY )
+   # global bin numbers run fastest along x
+   h.SetContent( PyROOTUtils.doubles( contents.ravel( order='F' ) ) )
+   h.SetEntries( contents.sum() )
+   return h
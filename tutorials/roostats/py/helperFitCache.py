@@ -0,0 +1,152 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Cache for the unconditional fit, shared by all jobs of a scan on a local or
+shared filesystem. The cache file is named after a hash of the workspace file
+and of the options that change the model (see helperModifyModelConfig.py), so
+a different workspace or a different POI/range/snapshot configuration gets a
+new entry.
+
+A cache file contains the RooFitResult of the fit (parameter values and
+covariance matrix) as "fitResult" and the result dictionary of the scan as
+JSON in the TObjString "record". The job that creates the entry holds a lock
+file while it fits and touches it regularly, so a lock only goes stale when
+its job has died. The other jobs wait for the entry to appear.
+"""
+
+
+
+import ROOT
+import hashlib, json, os, time, errno, socket, threading
+
+
+# options of helperModifyModelConfig.addOptionsToOptParse() that change the model
+modelOptions = ["wsName","mcName","dataName","loadSnapshots","overwritePOI","overwriteRange","overwriteBins"]
+
+
+def fileHash( fileName ):
+   h = hashlib.sha1()
+   f = open( fileName, "rb" )
+   while True:
+      block = f.read( 1 << 20 )
+      if not block: break
+      h.update( block )
+   f.close()
+   return h.hexdigest()
+
+def cacheKey( options, extra=None ):
+   """ Key from the content of the workspace file, the model options and an
+   optional dictionary of further settings that change the fit. """
+   config = dict( [ (o,getattr(options,o,None)) for o in modelOptions ] )
+   if extra: config.update( extra )
+   h = hashlib.sha1()
+   h.update( fileHash( options.input ).encode() )
+   h.update( json.dumps( config, sort_keys=True ).encode() )
+   return h.hexdigest()[:16]
+
+
+def readFitCache( fileName ):
+   """ Returns the record of a cache file or None if the file does not exist
+   or is incomplete. """
+   if not os.path.exists( fileName ): return None
+   f = ROOT.TFile.Open( fileName )
+   if not f or f.IsZombie(): return None
+   record = f.Get( "record" )
+   if record: record = json.loads( record.GetString().Data() )
+   f.Close()
+   return record or None
+
+
+
+class FitCache:
+   def __init__( self, directory, key, lockTimeout=3600.0 ):
+      """ A lock that was not touched for lockTimeout seconds is considered
+      to be left over from a crashed job and is removed. """
+      if not os.path.exists( directory ): os.makedirs( directory )
+      self.fileName = os.path.join( directory, "unconditionalFit_%s.root" % key )
+      self.lockFile = self.fileName+".lock"
+      self.lockTimeout = lockTimeout
+
+   def read( self ):
+      return readFitCache( self.fileName )
+
+   def readFitResult( self ):
+      f = ROOT.TFile.Open( self.fileName )
+      fitResult = f.Get( "fitResult" )
+      ROOT.SetOwnership( fitResult, True )
+      f.Close()
+      return fitResult
+
+   def write( self, record, fitResult ):
+      # write to a temporary file and rename, so that other jobs never see
+      # a partial file
+      tmpFile = self.fileName+".tmp%d" % os.getpid()
+      f = ROOT.TFile.Open( tmpFile, "RECREATE" )
+      fitResult.Write( "fitResult" )
+      ROOT.TObjString( json.dumps( record ) ).Write( "record" )
+      f.Close()
+      os.rename( tmpFile, self.fileName )
+
+   def acquire( self ):
+      try:
+         fd = os.open( self.lockFile, os.O_CREAT | os.O_EXCL | os.O_WRONLY )
+      except OSError:
+         try:
+            if time.time()-os.path.getmtime( self.lockFile ) > self.lockTimeout:
+               holder = open( self.lockFile ).read()
+               print( "Removing stale lock "+self.lockFile+" of "+holder )
+               os.remove( self.lockFile )
+         except (OSError,IOError):
+            pass
+         return False
+      os.write( fd, ( "%s:%d" % (socket.gethostname(),os.getpid()) ).encode() )
+      os.close( fd )
+      return True
+
+   def keepAlive( self, stop ):
+      """ Touches the lock file until stop is set. This runs in a thread
+      while the fit is running. """
+      while not stop.wait( self.lockTimeout/4.0 ):
+         try:
+            os.utime( self.lockFile, None )
+         except OSError:
+            pass
+
+   def release( self ):
+      try:
+         os.remove( self.lockFile )
+      except OSError as e:
+         # the lock was removed as stale by another job
+         if e.errno != errno.ENOENT: raise
+
+   def fetch( self, fit, pollInterval=5.0 ):
+      """ Returns the cached record. If there is none yet, the job that gets
+      the lock calls fit(), which has to return (record,fitResult), and
+      stores the result. All other jobs wait for it. """
+      waiting = False
+      while True:
+         record = self.read()
+         if record: return record
+         if self.acquire():
+            stop = threading.Event()
+            heartbeat = threading.Thread( target=self.keepAlive, args=(stop,) )
+            heartbeat.daemon = True
+            heartbeat.start()
+            try:
+               # another job might have finished just before the lock was free
+               record = self.read()
+               if not record:
+                  record,fitResult = fit()
+                  self.write( record, fitResult )
+            finally:
+               stop.set()
+               heartbeat.join()
+               self.release()
+            return record
+         if not waiting:
+            print( "Waiting for the unconditional fit of another job: "+self.fileName )
+            waiting = True
+         time.sleep( pollInterval )
@@ -0,0 +1,112 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Summary of the fit instrumentation of a profile likelihood scan: where the
+time went, which points were slowest and where on the POI grid fits failed
+or needed retries. An unconditional fit that was taken from the fit cache
+was done by another job and is not part of the timing totals.
+"""
+
+
+
+def isFailed( r ):
+   return r['status'] not in (0,1)
+
+
+class FitReport:
+   def __init__( self, poiNames, poiGrid, numSlowest=10 ):
+      """ poiGrid is the list of (bins,min,max) of the scan. """
+      self.poiNames = poiNames
+      self.poiGrid = poiGrid
+      self.numSlowest = numSlowest
+      self.unconditional = None
+      # by index, so that a retried point replaces the first attempt
+      self.conditional = {}
+
+   def add( self, r ):
+      # only keep what is needed to keep the memory small for large scans
+      summary = dict( [(k,r.get(k,0)) for k in ['index','nll','pois','status','retries','strategy','edm','calls','evalErrors','time','cpuTime','cached']] )
+      if r['index'] < 0: self.unconditional = summary
+      else: self.conditional[ r['index'] ] = summary
+
+   def failedIndices( self ):
+      return sorted( [i for i,r in self.conditional.items() if isFailed(r)] )
+
+   def gridBin( self, pois ):
+      return tuple( [
+         min( b-1, max( 0, int( (v-low)/(high-low)*b ) ) )
+         for v,(b,low,high) in zip( pois, self.poiGrid )
+      ] )
+
+   def failureMap( self ):
+      """ Text map of the POI grid for one or two POIs:
+      . converged, r converged after retries, x failed, blank not in this job.
+      The first POI is on the horizontal axis. """
+      if len( self.poiGrid ) > 2 or max( [g[0] for g in self.poiGrid] ) > 200: return None
+
+      rank = { ".": 0, "r": 1, "x": 2 }
+      symbols = {}
+      for r in self.conditional.values():
+         s = "."
+         if r['retries'] > 0: s = "r"
+         if isFailed( r ): s = "x"
+         # the worst result in a bin is shown
+         b = self.gridBin( r['pois'] )
+         if b not in symbols or rank[s] > rank[ symbols[b] ]: symbols[b] = s
+
+      nX = self.poiGrid[0][0]
+      nY = 1
+      if len( self.poiGrid ) == 2: nY = self.poiGrid[1][0]
+      lines = []
+      for y in reversed( range(nY) ):
+         row = "".join( [symbols.get( (x,y)[:len(self.poiGrid)], " " ) for x in range(nX)] )
+         lines.append( "   |"+row+"|" )
+      return "\n".join( lines )
+
+   def text( self ):
+      out = [ "### Fit Report" ]
+      if self.unconditional and self.unconditional['cached']:
+         out.append( "* Unconditional fit: from the fit cache (fitted by another job)" )
+      elif self.unconditional:
+         u = self.unconditional
+         out.append( "* Unconditional fit: %.1fs (CPU %.1fs), status %d, %d retries, %d NLL calls" % (u['time'],u['cpuTime'],u['status'],u['retries'],u['calls']) )
+
+      n = len( self.conditional )
+      if n:
+         totalTime = sum( [r['time'] for r in self.conditional.values()] )
+         totalCpu = sum( [r['cpuTime'] for r in self.conditional.values()] )
+         out.append( "* Conditional fits: %d points, %.1fs (CPU %.1fs), %.2fs per point" % (n,totalTime,totalCpu,totalTime/n) )
+         if self.unconditional and not self.unconditional['cached']:
+            out.append( "* Time split unconditional/conditional: %.1f%% / %.1f%%" % (
+               100.0*self.unconditional['time']/(self.unconditional['time']+totalTime),
+               100.0*totalTime/(self.unconditional['time']+totalTime),
+            ) )
+         out.append( "* Failed fits: %d" % len( [r for r in self.conditional.values() if isFailed(r)] ) )
+         out.append( "* Fits with retries: %d (%d retries in total)" % (
+            len( [r for r in self.conditional.values() if r['retries'] > 0] ),
+            sum( [r['retries'] for r in self.conditional.values()] ),
+         ) )
+         strategies = {}
+         for r in self.conditional.values(): strategies[ r['strategy'] ] = strategies.get( r['strategy'], 0 ) + 1
+         out.append( "* Final strategies: "+", ".join( ["%d: %d fits" % sv for sv in sorted(strategies.items())] ) )
+         out.append( "* NLL calls: %d, eval errors: %d" % (
+            sum( [r['calls'] for r in self.conditional.values()] ),
+            sum( [r['evalErrors'] for r in self.conditional.values()] ),
+         ) )
+
+         out.append( "* Slowest points:" )
+         for r in sorted( self.conditional.values(), key=lambda r: -r['time'] )[:self.numSlowest]:
+            out.append( "   * point %d: %.1fs, status %d, %d retries, strategy %d, edm %g, %d NLL calls, %d eval errors, %s" % (
+               r['index'], r['time'], r['status'], r['retries'], r['strategy'], r['edm'], r['calls'], r['evalErrors'],
+               ", ".join( [p+"="+str(v) for p,v in zip(self.poiNames,r['pois'])] ),
+            ) )
+
+         failureMap = self.failureMap()
+         if failureMap:
+            out.append( "* Failure map (. converged, r needed retries, x failed):" )
+            out.append( failureMap )
+
+      return "\n".join( out )
@@ -0,0 +1,204 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Reads the log files of BatchProfileLikelihood.py into NumPy arrays. Every file
+is split into byte ranges of --chunkSize bytes and the ranges are parsed in
+one pass in worker processes. The header of a file (the POI and NUIS lines
+before the first result) is read first, so every range is parsed into a
+float64 array with known columns. At most two ranges per worker are in flight
+or waiting to be collected, so the memory of the parsing is bounded by the
+chunk size and the number of workers, not by the size of the logs.
+
+readLogs() returns (POIs,NUISs,NLL,bestFit): the POI and nuisance parameter
+configurations as [(name,[bins,min,max]),...], a dictionary of columns (nll
+and all parameters) and the parameter values of the unconditional fit. It
+has to keep all columns, because that is what it returns. The scan state of
+helperScanState.py instead reduces every range to the bin minima as soon as
+it arrives, so its memory does not grow with the logs.
+"""
+
+
+
+import numpy as np
+import os
+
+# bytes per range
+defaultChunkSize = 1 << 24
+
+
+def parameterConfig( l, prefixLength ):
+   """ Parses "* POI name=[bins,min,max]" into (name,[bins,min,max]). """
+   eq = l.find("=")
+   return ( l[prefixLength:eq], [ float(c) for c in l[eq+2:l.rfind("]")].split(",") ] )
+
+def parseValues( l ):
+   """ Splits "a=1.0, b=2.0" into [(name,value),...]. Returns None if one of
+   the fields is not of that form. """
+   values = []
+   for field in l.rstrip().split(", "):
+      name,eq,value = field.partition("=")
+      if not eq: return None
+      try:
+         values.append( (name,float(value)) )
+      except ValueError:
+         return None
+   return values
+
+
+def mergeConfigs( configs, newConfigs ):
+   """ Appends the parameter configurations of another file that are not
+   known yet. """
+   for c in newConfigs:
+      if c[0] not in [k[0] for k in configs]: configs.append( c )
+
+
+def readHeader( fileName ):
+   """ Reads the POI and NUIS lines at the beginning of a log file up to the
+   first result. This runs in the worker processes. Returns
+   (POIs,NUISs,columnNames,bestFit,offset) with the offset of the first
+   result line. columnNames is None if there is no result yet. """
+   POIs = []
+   NUISs = []
+   bestFit = {}
+   offset = 0
+   f = open( fileName, "rb" )
+   for raw in f:
+      if raw[-1:] != b"\n": break
+      l = raw.decode( "latin-1" )
+      if l[:4] == "nll=":
+         f.close()
+         return (POIs,NUISs,["nll"]+[p[0] for p in POIs]+[n[0] for n in NUISs],bestFit,offset)
+      offset += len( raw )
+      if l[:6] == "* POI ": mergeConfigs( POIs, [parameterConfig( l, 6 )] )
+      elif l[:7] == "* NUIS ": mergeConfigs( NUISs, [parameterConfig( l, 7 )] )
+      elif l[:14] == "ucmles -- nll=":
+         values = parseValues( l[10:] )
+         if values: bestFit = dict( values )
+   f.close()
+   return (POIs,NUISs,None,bestFit,0)
+
+
+def fileRanges( fileName, offset, columnNames, chunkSize=defaultChunkSize ):
+   """ Tasks for readRange() that cover the file from the offset to its
+   current end. """
+   size = os.path.getsize( fileName )
+   return [
+      (fileName,start,min( start+chunkSize, size ),columnNames)
+      for start in range( offset, size, chunkSize )
+   ]
+
+def readRange( task ):
+   """ Parses the lines that start in the byte range [start,end) of a log
+   file. This runs in the worker processes. The task is
+   (fileName,start,end,columnNames). An incomplete last line (the job is
+   still writing) is left for the next call.
+   Returns (rows,bestFit,skipped,offset) with the offset of the first line
+   that was not read. """
+   fileName,start,end,columnNames = task
+   columnIndex = dict( [(name,i) for i,name in enumerate(columnNames)] )
+   bestFit = {}
+   rows = []
+   skipped = 0
+
+   f = open( fileName, "rb" )
+   if start > 0:
+      # the line that contains start belongs to the previous range
+      f.seek( start-1 )
+      if f.read( 1 ) != b"\n": f.readline()
+   offset = f.tell()
+   while offset < end:
+      raw = f.readline()
+      if raw[-1:] != b"\n": break
+      offset += len( raw )
+      l = raw.decode( "latin-1" )
+      c = l[:1]
+      if c == "n" and l[:4] == "nll=":
+         values = parseValues( l )
+         if values is None or len( values ) != len( columnNames ):
+            skipped += 1
+            continue
+         row = [0.0]*len( columnNames )
+         for name,v in values:
+            i = columnIndex.get( name )
+            if i is None: break
+            row[i] = v
+         else:
+            rows.append( row )
+            continue
+         skipped += 1
+      elif c == "u" and l[:14] == "ucmles -- nll=":
+         values = parseValues( l[10:] )
+         if values: bestFit = dict( values )
+   f.close()
+   return (np.array( rows, dtype=np.float64 ).reshape( (len(rows),len(columnNames)) ),bestFit,skipped,offset)
+
+
+def startPool( workers ):
+   if workers <= 1: return None
+   import multiprocessing
+   return multiprocessing.Pool( workers )
+
+def stopPool( pool ):
+   if pool:
+      pool.close()
+      pool.join()
+
+def imapBounded( pool, function, tasks, window ):
+   """ Generator over function(task) for the tasks in the given order. At
+   most window tasks are submitted to the pool and not yet collected. """
+   if pool is None:
+      for t in tasks: yield function( t )
+      return
+   pending = []
+   for t in tasks:
+      pending.append( pool.apply_async( function, (t,) ) )
+      if len( pending ) >= window: yield pending.pop( 0 ).get()
+   while pending: yield pending.pop( 0 ).get()
+
+
+def rangeColumns( rows, columnNames ):
+   """ Contiguous copies of the columns of the rows of one range. """
+   return dict( [(name,rows[:,i].copy()) for i,name in enumerate(columnNames)] )
+
+
+def readLogs( files, workers=1, chunkSize=defaultChunkSize ):
+   print( "Files: "+str(files) )
+   pool = startPool( workers )
+
+   POIs = []
+   NUISs = []
+   bestFit = {}
+   tasks = []
+   for fName,(filePOIs,fileNUISs,columnNames,fileBestFit,offset) in zip( files, imapBounded( pool, readHeader, files, 2*workers ) ):
+      mergeConfigs( POIs, filePOIs )
+      mergeConfigs( NUISs, fileNUISs )
+      bestFit.update( fileBestFit )
+      if columnNames: tasks += fileRanges( fName, offset, columnNames, chunkSize )
+
+   # per range: (number of rows,{name:column})
+   parts = []
+   points = dict( [(fName,0) for fName in files] )
+   skippedLines = dict( [(fName,0) for fName in files] )
+   for task,(rows,rangeBestFit,skipped,offset) in zip( tasks, imapBounded( pool, readRange, tasks, 2*workers ) ):
+      fName,columnNames = (task[0],task[3])
+      bestFit.update( rangeBestFit )
+      points[ fName ] += len( rows )
+      skippedLines[ fName ] += skipped
+      if len( rows ): parts.append( (len(rows),rangeColumns( rows, columnNames )) )
+   stopPool( pool )
+   for fName in files:
+      print( "Read "+fName+": "+str(points[fName])+" points" )
+      if skippedLines[fName]: print( "WARNING: Skipped "+str(skippedLines[fName])+" lines that did not contain all parameters in "+fName )
+
+   # merge column by column; columns that are missing in a file are NaN
+   names = ["nll"] + [p[0] for p in POIs] + [n[0] for n in NUISs]
+   NLL = {}
+   for name in names:
+      NLL[ name ] = np.concatenate( [np.empty(0)] + [
+         columns.pop( name ) if name in columns else np.full( n, np.nan )
+         for n,columns in parts
+      ] )
+   return (POIs,NUISs,NLL,bestFit)
@@ -0,0 +1,127 @@
+
+#  Created on: February 19, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Merges the HypoTestResults of many toy files. The files are reduced pairwise
+in rounds, and the pairs of a round are merged in parallel in a process pool.
+Intermediate results are written to a temporary directory next to the merged
+file.
+
+The merged file contains the workspace with the merged result and, as the
+TObjString "index", the size and modification time of every input file as
+JSON. A later run reuses the merged file as long as the inputs are unchanged
+and only merges files that were added since.
+"""
+
+
+
+import ROOT
+import json, os, shutil, tempfile
+
+
+def readResult( fileName, wName, htrName ):
+   f = ROOT.TFile.Open( fileName )
+   result = ROOT.RooStats.HypoTestResult( f.Get( wName ).obj( htrName ) )
+   f.Close()
+   return result
+
+def writeResult( result, fileName, wName, htrName, index=None ):
+   # write to a temporary file and rename, so that an interrupted merge
+   # does not leave a broken file behind
+   tmpFile = fileName+".tmp%d" % os.getpid()
+   result.SetName( htrName )
+   f = ROOT.TFile.Open( tmpFile, "RECREATE" )
+   w = ROOT.RooWorkspace( wName )
+   getattr( w, "import" )( result )
+   w.Write()
+   if index is not None: ROOT.TObjString( json.dumps( index ) ).Write( "index" )
+   f.Close()
+   os.rename( tmpFile, fileName )
+
+
+def fileIndex( files ):
+   """ {fileName:[size,mtime]} of the given files. """
+   index = {}
+   for fName in files:
+      s = os.stat( fName )
+      index[ os.path.abspath( fName ) ] = [s.st_size,s.st_mtime]
+   return index
+
+def readIndex( fileName ):
+   """ Returns the index of a merged file or None if the file does not exist
+   or is incomplete. """
+   if not os.path.exists( fileName ): return None
+   f = ROOT.TFile.Open( fileName )
+   if not f or f.IsZombie(): return None
+   index = f.Get( "index" )
+   if index: index = json.loads( index.GetString().Data() )
+   f.Close()
+   return index or None
+
+
+def mergePair( task ):
+   """ Merges two files into a third. This runs in the worker processes. """
+   fileA,fileB,outFile,wName,htrName = task
+   result = readResult( fileA, wName, htrName )
+   result.Append( readResult( fileB, wName, htrName ) )
+   writeResult( result, outFile, wName, htrName )
+   return outFile
+
+def treeMerge( files, workDir, wName, htrName, workers=1 ):
+   """ Pairwise reduction of the files. Returns the HypoTestResult. Files
+   in workDir are intermediate and removed once they are merged. """
+   pool = None
+   if workers > 1:
+      import multiprocessing
+      pool = multiprocessing.Pool( workers )
+
+   level = 0
+   while len( files ) > 1:
+      print( "Merging round "+str(level)+": "+str(len(files))+" files" )
+      tasks = [
+         (files[i],files[i+1],os.path.join( workDir, "merged_%d_%d.root" % (level,i//2) ),wName,htrName)
+         for i in range( 0, len(files)-1, 2 )
+      ]
+      if pool: merged = pool.map( mergePair, tasks )
+      else: merged = [ mergePair( t ) for t in tasks ]
+      # an odd file is passed on to the next round
+      if len( files ) % 2: merged.append( files[-1] )
+
+      for t in tasks:
+         for fName in t[:2]:
+            if os.path.dirname( fName ) == workDir: os.remove( fName )
+      files = merged
+      level += 1
+
+   if pool:
+      pool.close()
+      pool.join()
+   return readResult( files[0], wName, htrName )
+
+
+def mergeFiles( files, mergedFile, wName, htrName, workers=1 ):
+   """ Returns the merged HypoTestResult of the files. The merged file is
+   reused if the index shows that none of its inputs has changed. New
+   input files are merged into it. Otherwise all files are merged again. """
+   index = fileIndex( files )
+   cached = readIndex( mergedFile )
+   toMerge = files
+   if cached and all( [ index.get( fName ) == info for fName,info in cached.items() ] ):
+      toMerge = [ f for f in files if os.path.abspath( f ) not in cached ]
+      if not toMerge:
+         print( "Using merged file "+mergedFile )
+         return readResult( mergedFile, wName, htrName )
+      print( "Merging "+str(len(toMerge))+" new files into "+mergedFile )
+      toMerge = [mergedFile] + toMerge
+   elif cached:
+      print( "Input files have changed. Merging all files again." )
+
+   workDir = tempfile.mkdtemp( prefix="merge_", dir=os.path.dirname( os.path.abspath( mergedFile ) ) )
+   try:
+      result = treeMerge( toMerge, workDir, wName, htrName, workers )
+   finally:
+      shutil.rmtree( workDir )
+   writeResult( result, mergedFile, wName, htrName, index )
+   return result
@@ -0,0 +1,139 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Profile histograms from the columns of a scan for any number of POIs. All
+bins are computed on NumPy arrays that use the ROOT bin convention (bin 0 is
+the underflow and bin n+1 the overflow bin of every axis). The arrays are only
+converted to ROOT histograms at the end, and ROOT is only imported for that.
+
+POIs are given as [(name,[bins,min,max]),...] as returned by the readers of
+BatchProfileLikelihoodPlot.py.
+"""
+
+
+
+import numpy as np
+from array import array
+
+
+def binIndices( values, bins, low, high ):
+   """ Same as TAxis::FindBin() for an array of values. """
+   values = np.asarray( values, dtype=np.float64 )
+   scaled = np.nan_to_num( (values-low)/(high-low)*bins )
+   idx = np.floor( np.clip( scaled, -1.0, bins ) ).astype( np.int64 )+1
+   idx[ values < low ] = 0
+   idx[ values >= high ] = bins+1
+   return idx
+
+def histShape( POIs ):
+   return tuple( [ int(c[0])+2 for name,c in POIs ] )
+
+def flatBins( NLL, POIs ):
+   """ Returns the flat bin indices of all entries and a mask of the entries
+   with valid (not NaN) coordinates. """
+   coords = [ binIndices( NLL[name], int(c[0]), c[1], c[2] ) for name,c in POIs ]
+   valid = np.ones( len(coords[0]), dtype=bool )
+   for name,c in POIs: valid &= ~np.isnan( np.asarray( NLL[name], dtype=np.float64 ) )
+   return (np.ravel_multi_index( coords, histShape(POIs) ),valid)
+
+
+def binMinimum( NLL, POIs, values, init ):
+   """ Minimum of the values in every bin. Bins without entries are set to
+   init. Entries with a NaN value (failed fits) are skipped. Returns the
+   array of minima and the mask of filled bins. """
+   flat,valid = flatBins( NLL, POIs )
+   values = np.asarray( values, dtype=np.float64 )
+   valid &= ~np.isnan( values )
+   values = values[valid]
+   flat = flat[valid]
+   minima = np.full( histShape(POIs), init, dtype=np.float64 )
+   np.minimum.at( minima.reshape(-1), flat, values )
+   filled = np.zeros( histShape(POIs), dtype=bool )
+   filled.reshape(-1)[ flat ] = True
+   return (minima,filled)
+
+def binSum( NLL, POIs, weights ):
+   flat,valid = flatBins( NLL, POIs )
+   sums = np.zeros( histShape(POIs), dtype=np.float64 )
+   np.add.at( sums.reshape(-1), flat[valid], np.asarray( weights, dtype=np.float64 )[valid] )
+   return sums
+
+def binLast( NLL, POIs, values ):
+   """ The value of the last entry in every bin (like SetBinContent() in a
+   loop over the entries). """
+   flat,valid = flatBins( NLL, POIs )
+   last = np.zeros( histShape(POIs), dtype=np.float64 )
+   last.reshape(-1)[ flat[valid] ] = np.asarray( values, dtype=np.float64 )[valid]
+   return last
+
+
+def projections( minima, filled, maxDim=2 ):
+   """ All profile projections with one and two axes: the minimum over the
+   remaining axes. Returns a dictionary from the tuple of axes to
+   (minima,filled). """
+   dims = minima.ndim
+   axesList = [ (i,) for i in range(dims) ]
+   if maxDim >= 2: axesList += [ (i,j) for i in range(dims) for j in range(i+1,dims) ]
+
+   proj = {}
+   for axes in axesList:
+      if len( axes ) == dims: continue
+      others = tuple( [d for d in range(dims) if d not in axes] )
+      proj[ axes ] = ( minima.min( axis=others ), filled.any( axis=others ) )
+   return proj
+
+
+def fillEmptyBins( values, filled ):
+   """ Sets the bins that are not filled to the minimum of their filled
+   neighbours along the axes. Grows the filled region by one bin per pass.
+   Only the bins inside the axis ranges are considered. """
+   values = values.copy()
+   filled = filled.copy()
+   inner = tuple( [slice(1,n-1) for n in values.shape] )
+   inRange = np.zeros( values.shape, dtype=bool )
+   inRange[ inner ] = True
+
+   while True:
+      neighbourMin = np.full( values.shape, np.inf )
+      for axis in range( values.ndim ):
+         for shift in (1,-1):
+            v = np.where( filled, values, np.inf )
+            shifted = np.roll( v, shift, axis=axis )
+            # do not wrap around
+            edge = [slice(None)]*values.ndim
+            edge[axis] = 0 if shift == 1 else -1
+            shifted[ tuple(edge) ] = np.inf
+            neighbourMin = np.minimum( neighbourMin, shifted )
+      new = inRange & ~filled & np.isfinite( neighbourMin )
+      if not new.any(): break
+      values[ new ] = neighbourMin[ new ]
+      filled |= new
+   return (values,filled)
+
+
+def toHistogram( name, title, values, POIs ):
+   """ TH1D or TH2D for one or two POIs, THnD otherwise. values includes
+   the underflow and overflow bins. """
+   import ROOT
+   configs = [ (int(c[0]),c[1],c[2]) for n,c in POIs ]
+   if len( POIs ) == 1:
+      h = ROOT.TH1D( name, title, *configs[0] )
+   elif len( POIs ) == 2:
+      h = ROOT.TH2D( name, title, *(configs[0]+configs[1]) )
+   else:
+      h = ROOT.THnD(
+         name, title, len(POIs),
+         array( 'i', [c[0] for c in configs] ),
+         array( 'd', [c[1] for c in configs] ),
+         array( 'd', [c[2] for c in configs] ),
+      )
+      for coords in np.ndindex( *values.shape ):
+         h.SetBinContent( array( 'i', coords ), values[coords] )
+      return h
+
+   # global bin numbers run fastest along x
+   h.SetContent( np.ascontiguousarray( values.ravel( order='F' ) ) )
+   return h
@@ -0,0 +1,116 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Columnar output for BatchProfileLikelihood.py: one TTree row per fitted point
+with the grid index, NLL, the values of all POIs and nuisance parameters and
+the fit instrumentation from minimize() in BatchProfileLikelihood.py: status,
+retries, final strategy, EDM, NLL calls, eval errors, wall and CPU time. The unconditional fit is
+stored with index -1. The POI and nuisance parameter binnings are kept in the
+user info of the tree in the same form as in the log files.
+
+readResultTrees() returns the same structures as readLogs() in
+helperLogIngest.py.
+"""
+
+
+
+import ROOT
+import numpy as np
+from array import array
+
+import PyROOTUtils
+
+
+treeName = "profileLikelihood"
+intColumns = ["index","status","retries","strategy","calls","evalErrors"]
+doubleColumns = ["nll","edm","time","cpuTime"]
+
+
+class ResultTreeWriter:
+   def __init__( self, fileName, poiL, nuisL, poiGrid=None ):
+      """ poiGrid is the list of (bins,min,max) of the scan if it differs
+      from the binning of the POIs. """
+      self.poiNames = [ poiL.at(p).GetName() for p in range(poiL.getSize()) ]
+      self.nuisNames = [ nuisL.at(p).GetName() for p in range(nuisL.getSize()) ]
+
+      self.file = ROOT.TFile( fileName, "RECREATE" )
+      self.tree = ROOT.TTree( treeName, "profile likelihood scan" )
+      self.tree.SetAutoSave( 1000 )
+
+      self.buffers = {}
+      for name in intColumns:
+         self.buffers[ name ] = array( 'i', [0] )
+         self.tree.Branch( name, self.buffers[name], name+"/I" )
+      for name in doubleColumns+self.poiNames+self.nuisNames:
+         self.buffers[ name ] = array( 'd', [0.0] )
+         self.tree.Branch( name, self.buffers[name], name+"/D" )
+
+      if not poiGrid:
+         poiGrid = [ (poiL.at(p).getBins(),poiL.at(p).getMin(),poiL.at(p).getMax()) for p in range(poiL.getSize()) ]
+      for name,g in zip( self.poiNames, poiGrid ):
+         self.tree.GetUserInfo().Add( ROOT.TObjString( "POI %s=[%d,%f,%f]" % ((name,)+tuple(g)) ) )
+      for p in range( nuisL.getSize() ):
+         par = nuisL.at(p)
+         self.tree.GetUserInfo().Add( ROOT.TObjString(
+            "NUIS %s=[%d,%f,%f]" % (par.GetName(),par.getBins(),par.getMin(),par.getMax())
+         ) )
+
+   def fill( self, r ):
+      """ Adds a result dictionary as returned by conditionalFit(). """
+      for name in intColumns+doubleColumns:
+         self.buffers[ name ][0] = r.get( name, -1 )
+      for name,v in zip( self.poiNames, r['pois'] ): self.buffers[ name ][0] = v
+      for name,v in zip( self.nuisNames, r['nuis'] ): self.buffers[ name ][0] = v
+      self.tree.Fill()
+
+   def close( self ):
+      self.file.cd()
+      self.tree.Write()
+      self.file.Close()
+
+
+
+def parameterConfigs( tree, prefix ):
+   """ Returns [(name,[bins,min,max]),...] from the user info of the tree. """
+   configs = []
+   for obj in tree.GetUserInfo():
+      s = obj.GetName()
+      if not s.startswith( prefix+" " ): continue
+      name = s[len(prefix)+1:s.find("=")]
+      config = [ float(c) for c in s[s.find("=")+2:-1].split(",") ]
+      configs.append( (name,config) )
+   return configs
+
+
+def readColumns( chain, names ):
+   """ Reads the given branches of all entries into float64 arrays. """
+   columns,weights = PyROOTUtils.treeColumns( chain, names )
+   return dict( zip( names, columns ) )
+
+
+def readResultTrees( files ):
+   print( "Files: "+str(files) )
+   chain = ROOT.TChain( treeName )
+   for fName in files: chain.Add( fName )
+
+   # the binnings are the same for all jobs, so only the first file is read
+   f = ROOT.TFile.Open( files[0] )
+   POIs = parameterConfigs( f.Get( treeName ), "POI" )
+   NUISs = parameterConfigs( f.Get( treeName ), "NUIS" )
+   f.Close()
+
+   names = ["nll"] + [p[0] for p in POIs] + [n[0] for n in NUISs]
+   columns = readColumns( chain, ["index","status","time"]+names )
+   conditional = columns["index"] >= 0
+   NLL = {}
+   bestFit = {}
+   # the fit status and time are also returned for the conditional fits
+   for c in ["status","time"]+names:
+      NLL[ c ] = columns[c][ conditional ]
+      if ( c == "nll" or c in [p[0] for p in POIs] ) and not conditional.all():
+         bestFit[ c ] = columns[c][ ~conditional ][-1]
+
+   return (POIs,NUISs,NLL,bestFit)
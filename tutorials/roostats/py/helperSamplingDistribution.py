@@ -0,0 +1,137 @@
+
+#  Created on: February 20, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Sampling distributions as sorted NumPy arrays. The values and weights of a
+RooStats::SamplingDistribution are copied once, sorted, and the cumulative
+weights are stored. Quantiles, p-values and CLs for any number of queries
+then need one binary search per query instead of a pass over all toys.
+
+Bootstrap replicas reuse the sorted values and only draw new weights, so
+they do not need to be sorted again.
+"""
+
+
+
+import numpy as np
+import math
+
+
+class SortedSamplingDistribution:
+   def __init__( self, values, weights=None, isSorted=False ):
+      values = np.asarray( values, dtype=np.float64 )
+      if weights is None: weights = np.ones( len(values) )
+      weights = np.asarray( weights, dtype=np.float64 )
+      if not isSorted:
+         order = np.argsort( values, kind="mergesort" )
+         values,weights = (values[order],weights[order])
+      self.values = values
+      self.weights = weights
+      # cumulative weights and squared weights including the current entry
+      self.cumWeights = np.cumsum( weights )
+      self.cumWeights2 = np.cumsum( weights**2 )
+      self.total = self.cumWeights[-1] if len( weights ) else 0.0
+      self.total2 = self.cumWeights2[-1] if len( weights ) else 0.0
+
+   def size( self ):
+      return len( self.values )
+
+   def quantiles( self, probabilities ):
+      """ Weighted quantiles: the smallest value at which the cumulative
+      weight exceeds the fraction p of the total weight. For unweighted toys,
+      this is entry floor(p*N) of the sorted values, which is not always the
+      entry of SamplingDistribution::InverseCDF() (see inverseCDF()). """
+      probabilities = np.asarray( probabilities, dtype=np.float64 )
+      idx = np.searchsorted( self.cumWeights, probabilities*self.total, side="right" )
+      return self.values[ np.clip( idx, 0, len(self.values)-1 ) ]
+
+   def inverseCDF( self, probabilities ):
+      """ Same indexing as SamplingDistribution::InverseCDF(): with
+      nominal = int(p*N), returns -inf if nominal <= 0, +inf if
+      nominal >= N-1, entry nominal for p < 0.5 and entry nominal+1 for
+      p >= 0.5. The weights count as multiplicities. Without weights this is
+      the same value as ROOT, and for bootstrap replicas it is the ROOT value
+      of the resampled toys. ROOT itself ignores the weights. """
+      probabilities = np.asarray( probabilities, dtype=np.float64 )
+      nominal = np.floor( probabilities*self.total )
+      entry = np.where( probabilities < 0.5, nominal, nominal+1 )
+      idx = np.searchsorted( self.cumWeights, entry, side="right" )
+      result = self.values[ np.clip( idx, 0, max( 0, len(self.values)-1 ) ) ] if len( self.values ) else np.zeros( len(entry) )
+      # ROOT checks the lower end first
+      result = np.where( nominal >= self.total-1, np.inf, result )
+      return np.where( nominal <= 0, -np.inf, result )
+
+   def tailWeights( self, thresholds ):
+      """ Sum of the weights and of the squared weights of the entries that
+      are greater or equal to the thresholds. """
+      idx = np.searchsorted( self.values, np.asarray( thresholds, dtype=np.float64 ), side="left" )
+      before = np.concatenate( ([0.0],self.cumWeights) )[ idx ]
+      before2 = np.concatenate( ([0.0],self.cumWeights2) )[ idx ]
+      return (self.total-before,self.total2-before2)
+
+   def pValues( self, thresholds ):
+      """ Fraction of the weights in the right tail from the thresholds on
+      (including the thresholds). """
+      if self.total <= 0.0: return np.zeros( np.shape( thresholds ) )
+      return self.tailWeights( thresholds )[0]/self.total
+
+   def pValuesAndErrors( self, thresholds ):
+      """ p-values and their uncertainties. The variance is
+      sum_i w_i^2 (I_i-p)^2 / (sum_i w_i)^2 where I_i is one for entries in
+      the tail. Without weights this is the binomial p(1-p)/N. """
+      if self.total <= 0.0:
+         zeros = np.zeros( np.shape( thresholds ) )
+         return (zeros,zeros)
+      tail,tail2 = self.tailWeights( thresholds )
+      p = tail/self.total
+      variance = (1.0-p)**2*tail2 + p**2*(self.total2-tail2)
+      return (p,np.sqrt( variance )/self.total)
+
+   def replica( self, rng ):
+      """ Bootstrap replica with Poisson(1) weights on the same sorted
+      values. """
+      return SortedSamplingDistribution(
+         self.values, self.weights*rng.poisson( 1.0, len(self.weights) ), isSorted=True,
+      )
+
+   def bootstrap( self, function, nBootstrap=100, seed=0 ):
+      """ Applies function to nBootstrap replicas. Returns an array with the
+      results of the replicas along the first axis. """
+      rng = np.random.RandomState( seed )
+      return np.array( [ function( self.replica( rng ) ) for b in range( nBootstrap ) ] )
+
+   def bootstrapBand( self, function, nBootstrap=100, seed=0, cl=0.68 ):
+      """ Central interval with probability cl of function over the
+      bootstrap replicas. Returns (low,high). """
+      results = self.bootstrap( function, nBootstrap, seed )
+      return (
+         np.percentile( results, 50.0*(1.0-cl), axis=0 ),
+         np.percentile( results, 50.0*(1.0+cl), axis=0 ),
+      )
+
+
+def fromSamplingDistribution( dist ):
+   """ SortedSamplingDistribution of a RooStats::SamplingDistribution. """
+   import PyROOTUtils
+   values = dist.GetSamplingDistribution()
+   weights = dist.GetSampleWeights()
+   return SortedSamplingDistribution(
+      PyROOTUtils.bufferArray( values.data(), values.size() ).copy(),
+      PyROOTUtils.bufferArray( weights.data(), weights.size() ).copy(),
+   )
+
+
+def cls( nullDist, altDist, thresholds ):
+   """ CLs = CLs+b/CLb with the null as signal+background and the
+   alternative as background-only hypothesis. Both tail probabilities are
+   for test statistics greater or equal to the thresholds. """
+   clb = altDist.pValues( thresholds )
+   return np.where( clb > 0.0, nullDist.pValues( thresholds )/np.where( clb > 0.0, clb, 1.0 ), 1.0 )
+
+def expectedPValues( nullDist, altDist, nSigmas=(-2,-1,0,1,2) ):
+   """ Null p-values at the quantiles of the alternative distribution that
+   correspond to the median (0) and the nSigma bands. """
+   probabilities = [ 0.5*(1.0+math.erf( n/math.sqrt(2.0) )) for n in nSigmas ]
+   return nullDist.pValues( altDist.quantiles( probabilities ) )
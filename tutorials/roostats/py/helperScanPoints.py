@@ -0,0 +1,323 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Enumeration and ordering of the points of a scan over an N-cube grid. The grid
+is given by the number of bins in every dimension. Grid indices enumerate the
+points with the first dimension running fastest (as parametersNCube() in
+BatchProfileLikelihood.py does). A scan order is a list of grid indices in the
+sequence they should be visited.
+
+Instead of a grid, a scan can also go over an explicit list of points: read
+from a file or generated as a Latin hypercube, Sobol sequence or Smolyak
+sparse grid.
+"""
+
+
+import math
+from functools import reduce
+
+
+def gridCoordinates( bins, i ):
+   """ Returns the list of bin numbers of grid point i. """
+   coords = []
+   for b in bins:
+      coords.append( i % b )
+      i //= b
+   return coords
+
+def gridIndex( bins, coords ):
+   """ Inverse of gridCoordinates(). """
+   i = 0
+   for b,c in reversed( list(zip(bins,coords)) ):
+      i = i*b + c
+   return i
+
+def numGridPoints( bins ):
+   return reduce( lambda x,y: x*y, bins, 1 )
+
+
+
+def snakeOrder( bins ):
+   """ Boustrophedon ordering: every dimension reverses its direction when the
+   higher dimensions step, so consecutive points are always neighbours. """
+   order = []
+   for i in range( numGridPoints(bins) ):
+      raw = gridCoordinates( bins, i )
+      coords = list( raw )
+      parity = 0
+      for d in reversed( range(len(bins)) ):
+         if parity % 2: coords[d] = bins[d]-1-raw[d]
+         parity += coords[d]
+      order.append( gridIndex( bins, coords ) )
+   return order
+
+
+def hilbertKey( coords, nBits ):
+   """ Position of the integer coordinates on the Hilbert curve filling the
+   cube with side 2^nBits. Follows J. Skilling, "Programming the Hilbert
+   curve", AIP Conf. Proc. 707 (2004). """
+   x = list( coords )
+   n = len( x )
+   m = 1 << (nBits-1)
+
+   # inverse undo
+   q = m
+   while q > 1:
+      p = q-1
+      for i in range( n ):
+         if x[i] & q:
+            x[0] ^= p
+         else:
+            t = (x[0] ^ x[i]) & p
+            x[0] ^= t
+            x[i] ^= t
+      q >>= 1
+
+   # Gray encode
+   for i in range( 1, n ): x[i] ^= x[i-1]
+   t = 0
+   q = m
+   while q > 1:
+      if x[n-1] & q: t ^= q-1
+      q >>= 1
+   for i in range( n ): x[i] ^= t
+
+   # interleave the transposed bits into one key
+   key = 0
+   for b in reversed( range(nBits) ):
+      for i in range( n ):
+         key = (key << 1) | ((x[i] >> b) & 1)
+   return key
+
+def hilbertOrder( bins ):
+   """ Orders the grid along the Hilbert curve of the smallest enclosing
+   power-of-two cube. For grids that are not a power of two in every
+   dimension, the curve leaves the grid and the path has a few jumps. """
+   nBits = 1
+   while (1 << nBits) < max( bins ): nBits += 1
+
+   keys = [
+      ( hilbertKey( gridCoordinates(bins,i), nBits ), i )
+      for i in range( numGridPoints(bins) )
+   ]
+   return [ i for k,i in sorted(keys) ]
+
+
+scanOrders = ["grid", "snake", "hilbert"]
+
+def scanOrder( bins, order="grid" ):
+   """ Returns the list of grid indices for the given order. """
+   if order == "snake": return snakeOrder( bins )
+   if order == "hilbert": return hilbertOrder( bins )
+   return list( range( numGridPoints(bins) ) )
+
+
+
+class AdaptiveGrid:
+   """ Refinement of a coarse grid around contours (a quadtree in 2D, a
+   2^N-tree in general).
+
+   The coarse grid points are the vertices of cells. In every step, the cells
+   whose corner values lie on both sides of one of the levels are split into
+   2^N sub-cells, until the cells have the size of one fine grid step. All
+   points live on the fine grid that has 2^depth steps for every coarse step,
+   so they can be addressed with grid indices of the fine grid.
+   """
+
+   def __init__( self, coarseBins, depth ):
+      self.depth = depth
+      self.cellSize = 2**depth
+      self.bins = [ (b-1)*self.cellSize+1 for b in coarseBins ]
+      self.values = {}
+
+      self.corners = [()]
+      for d in range( len(coarseBins) ): self.corners = [ c+(o,) for c in self.corners for o in (0,1) ]
+
+      self.cells = [()]
+      for b in coarseBins:
+         self.cells = [ c+(x*self.cellSize,) for c in self.cells for x in range(b-1) ]
+
+   def fineRange( self, bins, low, high ):
+      """ Returns (bins,low,high) for the fine grid of a POI with the given
+      coarse binning. The fine grid points are at the bin centers and the
+      first and last point coincide with the first and last coarse bin
+      center. """
+      step = (high-low)/bins
+      fineStep = step/self.cellSize
+      return (
+         (bins-1)*self.cellSize+1,
+         low + 0.5*step - 0.5*fineStep,
+         high - 0.5*step + 0.5*fineStep,
+      )
+
+   def cellCorners( self, cell ):
+      return [
+         gridIndex( self.bins, [c+o*self.cellSize for c,o in zip(cell,offset)] )
+         for offset in self.corners
+      ]
+
+   def newPoints( self ):
+      """ Returns the sorted grid indices of all cell corners that do not
+      have a value yet. """
+      points = set()
+      for cell in self.cells:
+         points.update( [i for i in self.cellCorners( cell ) if i not in self.values] )
+      return sorted( points )
+
+   def setValue( self, i, value ):
+      self.values[i] = value
+
+   def refine( self, levels ):
+      """ Splits the cells that are crossed by one of the levels. Returns
+      False when the fine grid resolution is reached or no cell is crossed
+      by a level. """
+      if self.cellSize <= 1: return False
+
+      crossed = []
+      for cell in self.cells:
+         v = [ self.values[i] for i in self.cellCorners( cell ) ]
+         if [l for l in levels if min(v) < l <= max(v)]: crossed.append( cell )
+
+      self.cellSize //= 2
+      self.cells = [
+         tuple( [c+o*self.cellSize for c,o in zip(cell,offset)] )
+         for cell in crossed for offset in self.corners
+      ]
+      return len( self.cells ) > 0
+
+
+
+# Scans over lists of points. The points are tuples of POI values. Designs
+# are generated in the unit cube and scaled to the POI ranges.
+
+def scaleToRanges( unitPoints, ranges ):
+   """ ranges is a list of (min,max) for every dimension. """
+   return [
+      tuple( [low+u*(high-low) for u,(low,high) in zip(p,ranges)] )
+      for p in unitPoints
+   ]
+
+def readPoints( fileName, poiNames ):
+   """ Reads one point per line. A line is either of the form
+   "mu=1.0, mH=125" or it has the values in the order of the POIs,
+   separated by commas or spaces. Empty lines and lines starting with #
+   are skipped. """
+   points = []
+   f = open( fileName )
+   for l in f:
+      l = l.strip()
+      if not l or l[0] == "#": continue
+      if "=" in l:
+         values = dict( [ (pv.split("=")[0].strip(), float(pv.split("=")[1])) for pv in l.split(",") ] )
+         points.append( tuple( [values[p] for p in poiNames] ) )
+      else:
+         values = [ float(v) for v in l.replace(","," ").split() ]
+         if len( values ) != len( poiNames ):
+            print( "WARNING: Skipping point with wrong number of values: "+l )
+            continue
+         points.append( tuple( values ) )
+   f.close()
+   return points
+
+
+def latinHypercube( n, dims, seed=0 ):
+   """ Every dimension is divided into n intervals and every interval holds
+   exactly one point. """
+   import random
+   rng = random.Random( seed )
+   columns = []
+   for d in range( dims ):
+      perm = list( range(n) )
+      rng.shuffle( perm )
+      columns.append( [ (perm[i]+rng.random())/n for i in range(n) ] )
+   return list( zip( *columns ) )
+
+
+# primitive polynomials and initial direction numbers for the Sobol sequence
+# from S. Joe and F. Y. Kuo, SIAM J. Sci. Comput. 30, 2635 (2008): (s,a,[m])
+sobolDirections = [
+   (1, 0, [1]),
+   (2, 1, [1,3]),
+   (3, 1, [1,3,1]),
+   (3, 2, [1,1,1]),
+   (4, 1, [1,1,3,3]),
+   (4, 4, [1,3,5,13]),
+   (5, 2, [1,1,5,5,17]),
+   (5, 4, [1,1,5,5,5]),
+   (5, 7, [1,1,7,11,19]),
+]
+
+def sobol( n, dims, nBits=32 ):
+   """ First n points of the Sobol sequence (without the origin). """
+   if dims > len( sobolDirections )+1:
+      raise ValueError( "Sobol sequence only implemented for up to %d dimensions." % (len(sobolDirections)+1) )
+
+   directions = [ [1 << (nBits-i) for i in range(1,nBits+1)] ]
+   for s,a,m in sobolDirections[:dims-1]:
+      v = [ m[i] << (nBits-1-i) for i in range(s) ]
+      for i in range( s, nBits ):
+         x = v[i-s] ^ (v[i-s] >> s)
+         for k in range( 1, s ):
+            x ^= ((a >> (s-1-k)) & 1) * v[i-k]
+         v.append( x )
+      directions.append( v )
+
+   points = []
+   x = [0]*dims
+   for i in range( n ):
+      # index of the lowest zero bit of i
+      c = 0
+      while (i >> c) & 1: c += 1
+      x = [ xd ^ vd[c] for xd,vd in zip(x,directions) ]
+      points.append( tuple( [float(xd)/(1 << nBits) for xd in x] ) )
+   return points
+
+
+def clenshawCurtis( level ):
+   """ Nested Clenshaw-Curtis points in [0,1]. """
+   if level == 1: return [0.5]
+   m = 2**(level-1)+1
+   return [ 0.5*(1.0-math.cos(math.pi*j/(m-1))) for j in range(m) ]
+
+def smolyak( level, dims ):
+   """ Sparse grid: the union of the tensor products of Clenshaw-Curtis
+   points with levels l_1+...+l_dims <= level+dims-1. """
+   multiIndices = [()]
+   for d in range( dims ):
+      multiIndices = [ mi+(l,) for mi in multiIndices for l in range(1,level+1) ]
+   multiIndices = [ mi for mi in multiIndices if sum(mi) <= level+dims-1 ]
+
+   points = set()
+   for mi in multiIndices:
+      tensor = [()]
+      for l in mi: tensor = [ t+(x,) for t in tensor for x in clenshawCurtis(l) ]
+      # round to merge the points that are shared between levels
+      points.update( [ tuple([round(x,12) for x in t]) for t in tensor ] )
+   return sorted( points )
+
+
+def design( spec, dims ):
+   """ Points in the unit cube for a design specification of the form
+   lhs:n[:seed], sobol:n or smolyak:level. """
+   parts = spec.split(":")
+   if parts[0] == "lhs":
+      seed = 0
+      if len( parts ) > 2: seed = int( parts[2] )
+      return latinHypercube( int(parts[1]), dims, seed )
+   if parts[0] == "sobol": return sobol( int(parts[1]), dims )
+   if parts[0] == "smolyak": return smolyak( int(parts[1]), dims )
+   raise ValueError( "Unknown design: "+spec )
+
+
+def hilbertSortPoints( points, ranges, nBits=10 ):
+   """ Returns the indices of the points sorted along a Hilbert curve, so
+   that consecutive points are close to each other. """
+   cells = 1 << nBits
+   keys = []
+   for i,p in enumerate( points ):
+      coords = [ min( cells-1, max( 0, int((v-low)/(high-low)*cells) ) ) for v,(low,high) in zip(p,ranges) ]
+      keys.append( (hilbertKey( coords, nBits ), i) )
+   return [ i for k,i in sorted(keys) ]
@@ -0,0 +1,148 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Aggregated state of the log files of a running scan, so that
+BatchProfileLikelihoodPlot.py only has to read what was added since its last
+run. The state holds the minimum NLL of every bin of the POI grid, the best
+fit, the range of NLL values and, for every log file, the byte offset up to
+which it was read and its modification time.
+
+The state is stored as a NumPy .npz file.
+"""
+
+
+
+import numpy as np
+import json, os
+
+import helperLogIngest
+import helperProfileHist
+
+
+class ScanState:
+   def __init__( self ):
+      # fileName -> {'offset','mtime','columns'}
+      self.files = {}
+      self.POIs = []
+      self.NUISs = []
+      self.bestFit = {}
+      self.minNLL = np.inf
+      self.maxNLL = -np.inf
+      # raw NLL minima and filled bins in the layout of helperProfileHist
+      self.minima = None
+      self.filled = None
+
+   def isValid( self, files ):
+      """ Bin minima cannot be taken back, so the state is invalid when a
+      file that was read before has disappeared or was rewritten. """
+      for fName,info in self.files.items():
+         if fName not in files or not os.path.exists( fName ): return False
+         if os.path.getsize( fName ) < info['offset']: return False
+      return True
+
+   def update( self, files, workers=1, chunkSize=helperLogIngest.defaultChunkSize ):
+      """ Reads the new files and the new lines of files that were modified.
+      Every range of a file is reduced to bin minima as soon as it arrives.
+      Returns the number of new points. """
+      pool = helperLogIngest.startPool( workers )
+      # (fileName,offset,columnNames) of the files to continue reading
+      known = []
+      newFiles = []
+      for fName in files:
+         info = self.files.get( fName )
+         mtime = os.path.getmtime( fName )
+         if info and info['mtime'] == mtime: continue
+         if info and info['columns']: known.append( (fName,info['offset'],info['columns']) )
+         else:
+            newFiles.append( fName )
+            info = {'offset':0, 'columns':None}
+         self.files[ fName ] = {'offset':info['offset'], 'mtime':mtime, 'columns':info['columns']}
+      print( "Reading "+str(len(known)+len(newFiles))+" new or modified of "+str(len(files))+" files." )
+
+      # the headers of new files first, so that all POIs are known
+      headers = helperLogIngest.imapBounded( pool, helperLogIngest.readHeader, newFiles, 2*workers )
+      for fName,(filePOIs,fileNUISs,columnNames,fileBestFit,offset) in zip( newFiles, headers ):
+         helperLogIngest.mergeConfigs( self.POIs, filePOIs )
+         helperLogIngest.mergeConfigs( self.NUISs, fileNUISs )
+         self.bestFit.update( fileBestFit )
+         if not columnNames: continue
+         self.files[ fName ]['offset'] = offset
+         self.files[ fName ]['columns'] = columnNames
+         known.append( (fName,offset,columnNames) )
+
+      tasks = []
+      for fName,offset,columnNames in known:
+         tasks += helperLogIngest.fileRanges( fName, offset, columnNames, chunkSize )
+      newPoints = 0
+      skippedLines = {}
+      # files with an incomplete line; reading continues there next time
+      stopped = set()
+      ranges = helperLogIngest.imapBounded( pool, helperLogIngest.readRange, tasks, 2*workers )
+      for (fName,start,end,columnNames),(rows,rangeBestFit,skipped,offset) in zip( tasks, ranges ):
+         if fName not in stopped: self.files[ fName ]['offset'] = offset
+         if offset < end: stopped.add( fName )
+         if skipped: skippedLines[ fName ] = skippedLines.get( fName, 0 ) + skipped
+         self.bestFit.update( rangeBestFit )
+         if len( rows ): self.add( helperLogIngest.rangeColumns( rows, columnNames ), len( rows ) )
+         newPoints += len( rows )
+      helperLogIngest.stopPool( pool )
+      for fName,skipped in sorted( skippedLines.items() ):
+         print( "WARNING: Skipped "+str(skipped)+" lines that did not contain all parameters in "+fName )
+      return newPoints
+
+   def add( self, columns, n ):
+      """ Merges n points into the bin minima. POIs that are missing in the
+      columns are NaN, so the points are not binned. """
+      for name,c in self.POIs:
+         if name not in columns: columns[ name ] = np.full( n, np.nan )
+      nll = columns['nll']
+      # failed fits have a NaN NLL; they must not replace the minima
+      if not np.isnan( nll ).all(): self.minNLL = float( np.fmin( self.minNLL, np.nanmin( nll ) ) )
+      if (nll < 1e10).any(): self.maxNLL = max( self.maxNLL, nll[ nll < 1e10 ].max() )
+      minima,filled = helperProfileHist.binMinimum( columns, self.POIs, nll, np.inf )
+      if self.minima is None:
+         self.minima,self.filled = (minima,filled)
+      else:
+         self.minima = np.fmin( self.minima, minima )
+         self.filled |= filled
+
+   def save( self, fileName ):
+      meta = {
+         'files': self.files,
+         'POIs': self.POIs,
+         'NUISs': self.NUISs,
+         'bestFit': self.bestFit,
+         'minNLL': self.minNLL,
+         'maxNLL': self.maxNLL,
+      }
+      arrays = {}
+      if self.minima is not None: arrays = {'minima':self.minima, 'filled':self.filled}
+      # write to a temporary file and rename, so that an interrupted run
+      # does not leave a broken state behind
+      tmpFile = fileName+".tmp.npz"
+      np.savez( tmpFile, meta=np.array( json.dumps(meta) ), **arrays )
+      os.rename( tmpFile, fileName )
+
+
+def load( fileName ):
+   """ Returns the ScanState stored in the file or a new one if the file
+   does not exist. """
+   state = ScanState()
+   if not os.path.exists( fileName ): return state
+
+   stored = np.load( fileName )
+   meta = json.loads( str( stored['meta'] ) )
+   state.files = meta['files']
+   state.POIs = [ (n,c) for n,c in meta['POIs'] ]
+   state.NUISs = [ (n,c) for n,c in meta['NUISs'] ]
+   state.bestFit = meta['bestFit']
+   state.minNLL = meta['minNLL']
+   state.maxNLL = meta['maxNLL']
+   if 'minima' in stored.files:
+      state.minima = stored['minima']
+      state.filled = stored['filled']
+   stored.close()
+   return state
@@ -0,0 +1,49 @@
+
+#  Created on: February 19, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Reproducible random number streams. All seeds of a campaign are derived
+from one campaign seed (--seed) and a counter, for example the index of the
+first toy of a chunk or the index of a scan point. The derived seed is a
+hash of the campaign seed and the counter, so it does not depend on how the
+work is split into jobs and worker processes or in which order it runs.
+
+Without --seed, a campaign seed is drawn from the operating system and
+printed, so that the run can be repeated.
+"""
+
+
+
+import hashlib, os
+
+
+def addOptionsToOptParse( parser ):
+   parser.add_option(      "--seed", help="Campaign seed. All random number streams are derived from this seed, so results are reproducible and independent of how the work is split into jobs. Default is a random seed that is printed.", type="int", dest="seed", default=None )
+
+
+def campaignSeed( options ):
+   """ Returns options.seed. If it is not set, a random seed is drawn and
+   stored in options.seed. """
+   if options.seed is None:
+      options.seed = int( hashlib.sha1( os.urandom( 16 ) ).hexdigest()[:8], 16 )
+      print( "Campaign seed: --seed "+str(options.seed) )
+   return options.seed
+
+
+def streamSeed( campaign, *counters ):
+   """ Seed of the stream that is identified by the counters (integers or
+   strings) within the campaign. The seed is never 0, because
+   TRandom3::SetSeed(0) picks a random seed. """
+   key = ":".join( [ str(c) for c in (campaign,)+counters ] )
+   seed = int( hashlib.sha256( key.encode() ).hexdigest()[:8], 16 )
+   return seed or 1
+
+def setSeed( campaign, *counters ):
+   """ Seeds the RooFit random number generator with streamSeed(). Returns
+   the seed. """
+   import ROOT
+   seed = streamSeed( campaign, *counters )
+   ROOT.RooRandom.randomGenerator().SetSeed( seed )
+   return seed
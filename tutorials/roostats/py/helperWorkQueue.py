@@ -0,0 +1,90 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Work queue in an SQLite file, so that batch jobs on a shared filesystem can
+pull grid points instead of processing a fixed slice each. A claimed point
+is leased for a limited time. If it is not finished before the lease runs
+out (the job crashed or was killed), the point is handed out again.
+"""
+
+
+
+import sqlite3, json, time, threading
+
+
+
+class WorkQueue:
+   # states of points
+   todo,claimed,finished = (0,1,2)
+
+   def __init__( self, fileName, config, leaseTime=3600.0 ):
+      """ The configuration is stored with the queue by the first job. Compare
+      it with storedConfig to check that all jobs scan the same points. """
+      self.leaseTime = leaseTime
+      self.lock = threading.Lock()
+
+      # transactions are started explicitly; points are claimed in a
+      # different thread when worker processes are used
+      self.db = sqlite3.connect( fileName, timeout=600.0, isolation_level=None, check_same_thread=False )
+      self.db.execute( "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)" )
+      self.db.execute( "CREATE TABLE IF NOT EXISTS points (idx INTEGER PRIMARY KEY, ord INTEGER, state INTEGER, leaseEnd REAL)" )
+      self.db.execute( "CREATE INDEX IF NOT EXISTS pointsOrder ON points (state, ord)" )
+
+      self.db.execute( "BEGIN IMMEDIATE" )
+      self.db.execute( "INSERT OR IGNORE INTO meta VALUES ('config',?)", (json.dumps(config),) )
+      self.storedConfig = json.loads( self.db.execute( "SELECT value FROM meta WHERE key='config'" ).fetchone()[0] )
+      self.db.execute( "COMMIT" )
+
+   def populate( self, indices ):
+      """ Adds the grid indices in the order they should be processed.
+      Indices that are already in the queue are ignored, so every job can
+      call this. """
+      with self.lock:
+         self.db.execute( "BEGIN IMMEDIATE" )
+         self.db.executemany(
+            "INSERT OR IGNORE INTO points VALUES (?,?,?,0.0)",
+            [ (i,o,self.todo) for o,i in enumerate(indices) ],
+         )
+         self.db.execute( "COMMIT" )
+
+   def claim( self ):
+      """ Returns the next grid index to process or None when there is
+      nothing left. """
+      with self.lock:
+         now = time.time()
+         self.db.execute( "BEGIN IMMEDIATE" )
+         row = self.db.execute(
+            "SELECT idx FROM points WHERE state=? OR (state=? AND leaseEnd<?) ORDER BY ord LIMIT 1",
+            (self.todo,self.claimed,now),
+         ).fetchone()
+         if row:
+            self.db.execute(
+               "UPDATE points SET state=?, leaseEnd=? WHERE idx=?",
+               (self.claimed,now+self.leaseTime,row[0]),
+            )
+         self.db.execute( "COMMIT" )
+      if row: return row[0]
+      return None
+
+   def finish( self, i ):
+      with self.lock:
+         self.db.execute( "UPDATE points SET state=? WHERE idx=?", (self.finished,i) )
+
+   def points( self ):
+      """ Generator that claims points until the queue is empty. """
+      while True:
+         i = self.claim()
+         if i is None: return
+         yield i
+
+   def counts( self ):
+      """ Returns (todo,claimed,finished). """
+      with self.lock:
+         n = dict( self.db.execute( "SELECT state,COUNT(*) FROM points GROUP BY state" ).fetchall() )
+      return tuple( [n.get(s,0) for s in (self.todo,self.claimed,self.finished)] )
+
+   def close( self ):
+      self.db.close()
@@ -14,6 +14,9 @@ parser.add_option("-w", "--workspace", help="workspace name", dest="workspace",
 parser.add_option("-r", "--hypoTestResult", help="hypoTestResult name", dest="hypoTestResult", default="HypoTestCalculator_result" )
 parser.add_option("-o", "--output", help="pdf file with impsampl output", dest="output", default="ToysOutput/" )
 
+parser.add_option(      "--merged", help="File with the merged result of all input files. It is reused as long as the input files do not change. Default is mergedResult.root in the output directory.", dest="merged", default=None )
+parser.add_option(      "--workers", help="Number of processes for merging the input files.", type="int", dest="workers", default=1 )
+
 parser.add_option(      "--fits", help="an output for minos.py", dest="fits", default="minos.root" )
 
 parser.add_option(      "--ymin", help="p value low y range", type="float", dest="ymin", default=5e-8)
@@ -36,6 +39,8 @@ os.system( "rm "+options.output+"*.eps" )
 import ROOT
 import AtlasStyle
 import AtlasUtil
+import helperMergeResults
+import helperDetailedOutput
 
 ROOT.gROOT.SetBatch( True )
 ROOT.gStyle.SetPalette(1)
@@ -45,17 +50,14 @@ ROOT.gStyle.SetPalette(1)
 
 class HtrPlotMaker:
    def __init__( self, filename, wName, htrName ):
-      files = glob.glob( filename )
-      self.htr = None
-      for fName in files:
-         print( "Opening "+fName )
-         f = ROOT.TFile.Open( fName )
-         w = f.Get( wName )
-         if self.htr: self.htr.Append( w.obj(htrName) )
-         else:
-            self.htr = ROOT.RooStats.HypoTestResult( w.obj(htrName) )
-            self.htr.SetName( "HypoTestResult" )
-         f.Close()
+      mergedFile = options.merged or options.output+"mergedResult.root"
+      files = sorted( [
+         f for f in glob.glob( filename )
+         if os.path.abspath( f ) != os.path.abspath( mergedFile )
+      ] )
+      print( "Input files: "+str(len(files)) )
+      self.htr = helperMergeResults.mergeFiles( files, mergedFile, wName, htrName, options.workers )
+      self.htr.SetName( "HypoTestResult" )
       
    def drawHtr( self ):
       htr = self.htr #self.ws.obj( htrName )
@@ -78,6 +80,9 @@ class HtrPlotMaker:
       print( "variables in detailed data set: " )
       l.Print("v")
 
+      # read the detailed output once; all histograms are binned from it
+      detailed = helperDetailedOutput.DetailedOutput( fullResult )
+
       
       # sampling distributions first      
       plot = ROOT.RooStats.HypoTestPlot( htr, options.bins, options.xmin+1e-3, options.xmax+1e-3 )
@@ -92,22 +97,23 @@ class HtrPlotMaker:
       h.Fill( h.GetBinCenter(options.bins), h.GetBinContent(options.bins+1) )
       
       
-      hAll = ROOT.TH1F( "hAll","hAll", options.bins, options.xmin+1e-3, options.xmax+1e-3 )
-      fullResult.fillHistogram( hAll, ROOT.RooArgList(l.at(0),"tmpList") )
+      tsBinning = (options.bins, options.xmin+1e-3, options.xmax+1e-3)
+      hAll = helperDetailedOutput.toTH1F( "hAll","hAll", detailed.binned( l.at(0).GetName(), *tsBinning ), *tsBinning )
       normalization = hAll.Integral( "width" )
 
-      if "densityLabel" in fullResult.get():
-         densityLabels = fullResult.get()["densityLabel"]
-         for i in range( -1, 100 ):
-            if densityLabels.setIndex( i ): break
-            densName = densityLabels.getLabel()
+      densityHists = []
+      if "densityLabel" in detailed.categoryNames:
+         # all densities in one pass
+         groups,contents = detailed.binned( l.at(0).GetName(), *tsBinning, groupBy="densityLabel" )
+         for i,densContents in zip( groups, contents ):
+            densName = detailed.labels["densityLabel"][i]
             
-            hNull = ROOT.TH1F( densName,densName, options.bins, options.xmin+1e-3, options.xmax+1e-3 )
-            fullResult.fillHistogram( hNull, ROOT.RooArgList(l.at(0),"tmpList"), "densityLabel == densityLabel::%s" % densName )
+            hNull = helperDetailedOutput.toTH1F( densName,densName, densContents, *tsBinning )
             hNull.Scale( 1./normalization )
       
             hNull.SetLineColor( i+3 )
             plot.AddTH1( hNull, "HIST SAME" )
+            densityHists.append( hNull )
       
       nPOI = options.dof
       if not options.twoSided:
@@ -161,7 +167,7 @@ class HtrPlotMaker:
             if l.at(i).GetName() in v:
                print( "adding to correlation list: %s" % l.at(i).GetName() ) 
                corrVars.add( l.at(i) )
-         corrMatrix = fullResult.correlationMatrix( corrVars )
+         corrMatrix = detailed.correlationMatrix( [ corrVars.at(j).GetName() for j in range( corrVars.getSize() ) ] )
          corrMatrix.Print()
          corrHist = ROOT.TH2D( corrMatrix )
          corrHist.GetZaxis().SetRangeUser( -1,1 )
@@ -185,10 +191,8 @@ class HtrPlotMaker:
          if l.at(i).GetName().count('_') == 1:
             if i == 0: continue
 
-            lowest1, highest1 = (  ROOT.Double(-1), ROOT.Double(1)  )
-            fullResult.getRange( l.at(0), lowest1, highest1 )
-            lowest2, highest2 = (  ROOT.Double(-1), ROOT.Double(1)  )
-            fullResult.getRange( l.at(i), lowest2, highest2 )
+            lowest1, highest1 = detailed.range( l.at(0).GetName() )
+            lowest2, highest2 = detailed.range( l.at(i).GetName() )
             
             if highest1 <= lowest1+1:
                highest1 += 1
@@ -208,7 +212,8 @@ class HtrPlotMaker:
             c.cd()
             print( "(%f, %f)" % (lowest2,highest2) )
             plot = ROOT.RooStats.SamplingDistPlot( options.bins, lowest2, highest2 )
-            plot.AddSamplingDistribution( ROOT.RooStats.SamplingDistribution( l.at(i).GetName(),l.at(i).GetName(), fullResult, l.at(i).GetName() ) )
+            samplingDist = detailed.samplingDistribution( l.at(i).GetName() )
+            plot.AddSamplingDistribution( samplingDist )
             plot.SetLineColor( ROOT.kRed )
             plot.SetLogYaxis( True )
             plot.SetYRange( 1e-5,5 )
@@ -224,7 +229,14 @@ class HtrPlotMaker:
             c2D.cd().SetLogz( True )
             ROOT.gPad.SetRightMargin( 0.15 )
             
-            h1 = fullResult.createHistogram( l.at(0), l.at(i), options.bins, options.bins )
+            h1 = helperDetailedOutput.toTH2F(
+               "comparison_"+l.at(0).GetName()+"_"+l.at(i).GetName(), "",
+               detailed.binned2D(
+                  l.at(0).GetName(), options.bins, lowest1, highest1,
+                  l.at(i).GetName(), options.bins, lowest2, highest2,
+               ),
+               options.bins, lowest1, highest1, options.bins, lowest2, highest2,
+            )
             h1.GetXaxis().SetTitle( l.at(0).GetTitle() )
             h1.GetYaxis().SetTitle( l.at(i).GetTitle() )
             h1.GetZaxis().SetRangeUser( 5e-8, 15 )
@@ -244,11 +256,12 @@ class HtrPlotMaker:
          if l.at(i).GetName().count('_') > 1:
             c.cd()
             ROOT.gPad.SetRightMargin( 0.15 ) # in case there are powers of the x-axis values (as for NLL)
-            lowest, highest = (  ROOT.Double(-1), ROOT.Double(1)  )
-            fullResult.getRange( l.at(i), lowest, highest )
+            lowest, highest = detailed.range( l.at(i).GetName() )
             # normal
-            h1 = ROOT.TH1F( "oneVar_%s" % l.at(i).GetName(), l.at(i).GetTitle(), 50, lowest, highest )
-            fullResult.fillHistogram( h1, ROOT.RooArgList(l.at(i),"tmpList") )
+            h1 = helperDetailedOutput.toTH1F(
+               "oneVar_%s" % l.at(i).GetName(), l.at(i).GetTitle(),
+               detailed.binned( l.at(i).GetName(), 50, lowest, highest ), 50, lowest, highest,
+            )
             h1.GetXaxis().SetTitle( l.at(i).GetTitle() )
             h1.SetMinimum( 0.7 )
             h1.Draw( "HIST" )
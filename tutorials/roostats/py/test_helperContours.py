@@ -0,0 +1,68 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperContours.py. Run with: python -m pytest
+"""
+
+
+
+import numpy as np
+
+import helperContours
+
+
+def grid( f, n=11 ):
+   x = np.linspace( -1.0, 1.0, n )
+   y = np.linspace( -1.0, 1.0, n )
+   return (x,y,f( x[:,None], y[None,:] ))
+
+def lines( x, y, z, level ):
+   points,segments = helperContours.contourSegments( x, y, z, level )
+   return [ [ points[k] for k in line ] for line in helperContours.stitch( segments ) ]
+
+
+def test_closedContour():
+   x,y,z = grid( lambda x,y: x**2+y**2 )
+   found = lines( x, y, z, 0.5 )
+   assert len( found ) == 1
+   line = found[0]
+   assert line[0] == line[-1]
+   # every crossing is on a linearly interpolated circle of radius ~0.7
+   r = [ np.hypot( px, py ) for px,py in line ]
+   assert min( r ) > 0.65 and max( r ) < 0.75
+
+def test_openContour():
+   x,y,z = grid( lambda x,y: x+0.0*y )
+   found = lines( x, y, z, 0.05 )
+   assert len( found ) == 1
+   line = found[0]
+   assert len( line ) == len( y )
+   assert line[0] != line[-1]
+   assert np.allclose( [ px for px,py in line ], 0.05 )
+   assert sorted( [ py for px,py in line ] ) == sorted( y )
+
+def test_nanCellsAreSkipped():
+   x,y,z = grid( lambda x,y: x+0.0*y )
+   z[:,5] = np.nan
+   found = lines( x, y, z, 0.05 )
+   # the NaN row splits the line in two open contours
+   assert len( found ) == 2
+   for line in found:
+      assert not np.isnan( line ).any()
+      assert line[0] != line[-1]
+
+def test_saddle():
+   # two corners above the level on one diagonal
+   x = np.array( [0.0,1.0] )
+   y = np.array( [0.0,1.0] )
+   points,segments = helperContours.contourSegments( x, y, [[1.0,0.0],[0.0,1.0]], 0.4 )
+   assert len( points ) == 4
+   assert len( segments ) == 2
+   assert len( helperContours.stitch( segments ) ) == 2
+
+def test_noContour():
+   x,y,z = grid( lambda x,y: x**2+y**2 )
+   assert lines( x, y, z, 5.0 ) == []
@@ -0,0 +1,59 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperLogIngest.py. Run with: python -m pytest
+"""
+
+
+
+import numpy as np
+
+import helperLogIngest
+
+
+log = "".join( [
+   "* POI mu=[4,0.0,4.0]\n",
+   "ucmles -- nll=0.5, mu=1.0\n",
+] + [ "nll=%d.5, mu=%d.25\n" % (i,i%4) for i in range( 20 ) ] + [
+   "nll=bad, mu=1.0\n",
+   "nll=7.0, mu=",
+] )
+
+def writeLog( tmpdir ):
+   fName = str( tmpdir.join( "scan.log" ) )
+   f = open( fName, "w" )
+   f.write( log )
+   f.close()
+   return fName
+
+
+def test_readHeader( tmpdir ):
+   fName = writeLog( tmpdir )
+   POIs,NUISs,columnNames,bestFit,offset = helperLogIngest.readHeader( fName )
+   assert POIs == [("mu",[4.0,0.0,4.0])]
+   assert columnNames == ["nll","mu"]
+   assert bestFit == {'nll':0.5, 'mu':1.0}
+   assert log[offset:].startswith( "nll=0.5" )
+
+def test_rangesCoverEveryLineOnce( tmpdir ):
+   fName = writeLog( tmpdir )
+   offset = helperLogIngest.readHeader( fName )[4]
+   for chunkSize in (1,5,17,1000):
+      tasks = helperLogIngest.fileRanges( fName, offset, ["nll","mu"], chunkSize )
+      results = [ helperLogIngest.readRange( t ) for t in tasks ]
+      rows = np.concatenate( [r[0] for r in results] )
+      assert list( rows[:,0] ) == [ i+0.5 for i in range( 20 ) ]
+      assert sum( [r[2] for r in results] ) == 1
+      # the incomplete last line is left for the next call: the first range
+      # that stops before its end returns its offset
+      stopped = [ r[3] for t,r in zip( tasks, results ) if r[3] < t[2] ]
+      assert stopped[0] == log.rfind( "nll=7.0" )
+
+def test_readLogs( tmpdir ):
+   fName = writeLog( tmpdir )
+   POIs,NUISs,NLL,bestFit = helperLogIngest.readLogs( [fName], chunkSize=30 )
+   assert list( NLL['mu'] ) == [ (i%4)+0.25 for i in range( 20 ) ]
+   assert bestFit['nll'] == 0.5
@@ -0,0 +1,60 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperProfileHist.py. Run with: python -m pytest
+"""
+
+
+
+import numpy as np
+
+import helperProfileHist
+
+
+POIs = [ ("mu",[4,0.0,4.0]) ]
+
+def test_binIndices():
+   idx = helperProfileHist.binIndices( [-1.0,0.0,0.5,3.99,4.0,10.0], 4, 0.0, 4.0 )
+   assert list( idx ) == [0,1,1,4,5,5]
+
+def test_binMinimum():
+   NLL = {'mu':np.array( [0.5,0.7,2.5,np.nan] )}
+   minima,filled = helperProfileHist.binMinimum( NLL, POIs, [3.0,1.0,2.0,0.0], np.inf )
+   assert list( minima ) == [np.inf,1.0,np.inf,2.0,np.inf,np.inf]
+   assert list( filled ) == [False,True,False,True,False,False]
+
+def test_binMinimumSkipsNaN():
+   # a failed fit in a bin with a good fit and a bin with only a failed fit
+   NLL = {'mu':np.array( [0.5,0.7,1.5] )}
+   minima,filled = helperProfileHist.binMinimum( NLL, POIs, [5.0,np.nan,np.nan], np.inf )
+   assert minima[1] == 5.0
+   assert minima[2] == np.inf and not filled[2]
+   assert not np.isnan( minima ).any()
+
+def test_binMinimum2D():
+   POIs2 = [ ("a",[2,0.0,2.0]), ("b",[3,0.0,3.0]) ]
+   NLL = {'a':np.array( [0.5,0.5,1.5] ), 'b':np.array( [2.5,2.5,0.5] )}
+   minima,filled = helperProfileHist.binMinimum( NLL, POIs2, [2.0,1.0,4.0], np.inf )
+   assert minima.shape == (4,5)
+   assert minima[1,3] == 1.0 and minima[2,1] == 4.0
+   assert filled.sum() == 2
+
+def test_projections():
+   minima = np.arange( 24, dtype=np.float64 ).reshape( (2,3,4) )
+   filled = np.zeros( (2,3,4), dtype=bool )
+   filled[1,2,3] = True
+   proj = helperProfileHist.projections( minima, filled )
+   assert sorted( proj.keys() ) == [(0,),(0,1),(0,2),(1,),(1,2),(2,)]
+   assert list( proj[(2,)][0] ) == [0.0,1.0,2.0,3.0]
+   assert proj[(0,1)][1][1,2] and proj[(0,1)][1].sum() == 1
+
+def test_fillEmptyBins():
+   values = np.array( [9.0,1.0,9.0,9.0,9.0,9.0] )
+   filled = np.array( [False,True,False,False,False,False] )
+   values,filled = helperProfileHist.fillEmptyBins( values, filled )
+   # only the bins inside the axis range are filled
+   assert list( values ) == [9.0,1.0,1.0,1.0,1.0,9.0]
+   assert list( filled ) == [False,True,True,True,True,False]
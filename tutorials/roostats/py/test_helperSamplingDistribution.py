@@ -0,0 +1,72 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperSamplingDistribution.py. Run with: python -m pytest
+"""
+
+
+
+import numpy as np
+
+import helperSamplingDistribution
+
+
+def rootInverseCDF( values, p ):
+   """ The indexing of SamplingDistribution::InverseCDF(). """
+   values = sorted( values )
+   nominal = int( p*len(values) )
+   if nominal <= 0: return -np.inf
+   if nominal >= len(values)-1: return np.inf
+   if p < 0.5: return values[ nominal ]
+   return values[ nominal+1 ]
+
+
+def test_inverseCDF():
+   rng = np.random.RandomState( 1 )
+   for n in [1,2,3,10,101]:
+      values = rng.normal( size=n )
+      dist = helperSamplingDistribution.SortedSamplingDistribution( values )
+      probabilities = [0.0,0.02,0.16,0.3,0.49,0.5,0.51,0.84,0.98,1.0]
+      expected = [ rootInverseCDF( values, p ) for p in probabilities ]
+      assert list( dist.inverseCDF( probabilities ) ) == expected
+
+def test_inverseCDFWeightsAsMultiplicities():
+   weighted = helperSamplingDistribution.SortedSamplingDistribution( [3.0,1.0,2.0], [1,2,3] )
+   repeated = helperSamplingDistribution.SortedSamplingDistribution( [1.0,1.0,2.0,2.0,2.0,3.0] )
+   probabilities = [0.2,0.4,0.5,0.6]
+   assert list( weighted.inverseCDF( probabilities ) ) == list( repeated.inverseCDF( probabilities ) )
+
+def test_quantiles():
+   dist = helperSamplingDistribution.SortedSamplingDistribution( [4.0,1.0,3.0,2.0] )
+   assert list( dist.quantiles( [0.0,0.25,0.5,0.99] ) ) == [1.0,2.0,3.0,4.0]
+   weighted = helperSamplingDistribution.SortedSamplingDistribution( [1.0,2.0], [3.0,1.0] )
+   assert list( weighted.quantiles( [0.5,0.8] ) ) == [1.0,2.0]
+
+def test_pValues():
+   dist = helperSamplingDistribution.SortedSamplingDistribution( [1.0,2.0,2.0,3.0] )
+   # tails include the thresholds
+   assert list( dist.pValues( [0.0,1.0,2.0,2.5,3.0,4.0] ) ) == [1.0,1.0,0.75,0.25,0.25,0.0]
+   weighted = helperSamplingDistribution.SortedSamplingDistribution( [1.0,2.0], [3.0,1.0] )
+   assert list( weighted.pValues( [2.0] ) ) == [0.25]
+   empty = helperSamplingDistribution.SortedSamplingDistribution( [] )
+   assert list( empty.pValues( [1.0] ) ) == [0.0]
+
+def test_pValuesAndErrors():
+   dist = helperSamplingDistribution.SortedSamplingDistribution( np.arange( 100.0 ) )
+   p,err = dist.pValuesAndErrors( [90.0] )
+   assert np.allclose( p, 0.1 )
+   assert np.allclose( err, np.sqrt( 0.1*0.9/100 ) )
+
+def test_cls():
+   null = helperSamplingDistribution.SortedSamplingDistribution( [1.0,2.0,3.0,4.0] )
+   alt = helperSamplingDistribution.SortedSamplingDistribution( [0.0,1.0,2.0,5.0] )
+   assert list( helperSamplingDistribution.cls( null, alt, [3.0,6.0] ) ) == [2.0,1.0]
+
+def test_bootstrapIsReproducible():
+   dist = helperSamplingDistribution.SortedSamplingDistribution( np.arange( 20.0 ) )
+   first = dist.bootstrap( lambda d: d.pValues( [10.0] ), nBootstrap=10, seed=3 )
+   assert first.shape == (10,1)
+   assert np.array_equal( first, dist.bootstrap( lambda d: d.pValues( [10.0] ), nBootstrap=10, seed=3 ) )
@@ -0,0 +1,110 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperScanPoints.py. Run with: python -m pytest
+"""
+
+
+
+import pytest
+
+import helperScanPoints
+
+
+def distance( bins, i, j ):
+   a = helperScanPoints.gridCoordinates( bins, i )
+   b = helperScanPoints.gridCoordinates( bins, j )
+   return sum( [abs(x-y) for x,y in zip(a,b)] )
+
+
+def test_gridIndex():
+   bins = [3,4,5]
+   assert helperScanPoints.numGridPoints( bins ) == 60
+   # the first dimension runs fastest
+   assert helperScanPoints.gridCoordinates( bins, 1 ) == [1,0,0]
+   assert helperScanPoints.gridCoordinates( bins, 3 ) == [0,1,0]
+   for i in range( 60 ):
+      assert helperScanPoints.gridIndex( bins, helperScanPoints.gridCoordinates( bins, i ) ) == i
+
+@pytest.mark.parametrize( "bins", [[5],[3,2],[4,3,2]] )
+def test_snakeOrder( bins ):
+   order = helperScanPoints.scanOrder( bins, "snake" )
+   assert sorted( order ) == list( range( helperScanPoints.numGridPoints( bins ) ) )
+   assert [ distance( bins, i, j ) for i,j in zip( order[:-1], order[1:] ) ] == [1]*(len(order)-1)
+
+def test_hilbertOrder():
+   bins = [8,8]
+   order = helperScanPoints.scanOrder( bins, "hilbert" )
+   assert sorted( order ) == list( range( 64 ) )
+   # on a power-of-two grid, the curve only steps to neighbours
+   assert [ distance( bins, i, j ) for i,j in zip( order[:-1], order[1:] ) ] == [1]*63
+   assert sorted( helperScanPoints.scanOrder( [5,3], "hilbert" ) ) == list( range( 15 ) )
+
+def test_gridOrder():
+   assert helperScanPoints.scanOrder( [2,3] ) == list( range( 6 ) )
+
+
+def test_adaptiveGrid():
+   grid = helperScanPoints.AdaptiveGrid( [3,3], 2 )
+   assert grid.bins == [9,9]
+   assert grid.fineRange( 3, 0.0, 3.0 ) == (9,0.375,2.625)
+   points = grid.newPoints()
+   assert len( points ) == 9
+   # a level that crosses only the first cell
+   for i in points:
+      grid.setValue( i, 0.0 if i == 0 else 2.0 )
+   assert grid.refine( [1.0] )
+   assert grid.cellSize == 2
+   assert len( grid.cells ) == 4
+   assert len( grid.newPoints() ) == 5
+
+
+def test_latinHypercube():
+   n = 10
+   points = helperScanPoints.latinHypercube( n, 3, seed=1 )
+   assert len( points ) == n
+   for d in range( 3 ):
+      assert sorted( [int(p[d]*n) for p in points] ) == list( range( n ) )
+   assert points == helperScanPoints.latinHypercube( n, 3, seed=1 )
+   assert points != helperScanPoints.latinHypercube( n, 3, seed=2 )
+
+def test_sobol():
+   assert helperScanPoints.sobol( 5, 2 ) == [(0.5,0.5),(0.75,0.25),(0.25,0.75),(0.375,0.375),(0.875,0.875)]
+   points = helperScanPoints.sobol( 64, 4 )
+   # the points fill the dyadic intervals of length 1/64 in every dimension
+   for d in range( 4 ):
+      assert len( set( [int(p[d]*64) for p in points] ) ) >= 63
+   with pytest.raises( ValueError ):
+      helperScanPoints.sobol( 4, 20 )
+
+def test_smolyak():
+   assert helperScanPoints.smolyak( 1, 3 ) == [(0.5,0.5,0.5)]
+   assert helperScanPoints.smolyak( 2, 2 ) == [(0.0,0.5),(0.5,0.0),(0.5,0.5),(0.5,1.0),(1.0,0.5)]
+   # far fewer points than the full grid with the same resolution
+   assert len( helperScanPoints.smolyak( 3, 3 ) ) < 5**3
+
+def test_design():
+   assert len( helperScanPoints.design( "lhs:7:3", 2 ) ) == 7
+   assert helperScanPoints.design( "sobol:3", 2 ) == helperScanPoints.sobol( 3, 2 )
+   assert helperScanPoints.design( "smolyak:2", 2 ) == helperScanPoints.smolyak( 2, 2 )
+   with pytest.raises( ValueError ):
+      helperScanPoints.design( "grid:3", 2 )
+   assert helperScanPoints.scaleToRanges( [(0.0,0.5),(1.0,1.0)], [(1.0,3.0),(-1.0,1.0)] ) == [(1.0,0.0),(3.0,1.0)]
+
+
+def test_readPoints( tmpdir ):
+   fName = str( tmpdir.join( "points.txt" ) )
+   f = open( fName, "w" )
+   f.write( "# mu mH\n\nmH=125, mu=1.0\n0.5, 126\n2.0 127\n1.0\n" )
+   f.close()
+   assert helperScanPoints.readPoints( fName, ["mu","mH"] ) == [(1.0,125.0),(0.5,126.0),(2.0,127.0)]
+
+def test_hilbertSortPoints():
+   points = [(0.9,0.1),(0.1,0.1),(0.1,0.9),(0.9,0.9),(0.12,0.12)]
+   order = helperScanPoints.hilbertSortPoints( points, [(0.0,1.0),(0.0,1.0)] )
+   assert sorted( order ) == list( range( 5 ) )
+   # close points are next to each other
+   assert abs( order.index( 1 ) - order.index( 4 ) ) == 1
@@ -0,0 +1,86 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperScanState.py. Run with: python -m pytest
+"""
+
+
+
+import numpy as np
+import os
+
+import helperScanState
+
+
+def writeLog( fileName, lines, mode="w", mtime=None ):
+   f = open( fileName, mode )
+   f.write( "".join( [l+"\n" for l in lines] ) )
+   f.close()
+   if mtime: os.utime( fileName, (mtime,mtime) )
+
+
+def test_updateIncremental( tmpdir ):
+   fName = str( tmpdir.join( "scan.log" ) )
+   writeLog( fName, ["* POI mu=[4,0.0,4.0]", "nll=3.0, mu=0.5", "nll=2.0, mu=1.5"], mtime=1000 )
+   state = helperScanState.ScanState()
+   assert state.update( [fName] ) == 2
+   assert state.minNLL == 2.0
+
+   writeLog( fName, ["nll=1.0, mu=0.7"], mode="a", mtime=2000 )
+   assert state.update( [fName] ) == 1
+   assert state.minNLL == 1.0
+   assert list( state.minima ) == [np.inf,1.0,2.0,np.inf,np.inf,np.inf]
+
+   # nothing changed
+   assert state.update( [fName] ) == 0
+
+def test_updateWithNaN( tmpdir ):
+   fName = str( tmpdir.join( "scan.log" ) )
+   writeLog( fName, ["* POI mu=[4,0.0,4.0]", "nll=3.0, mu=0.5", "nll=2.0, mu=1.5"], mtime=1000 )
+   state = helperScanState.ScanState()
+   state.update( [fName] )
+
+   # a chunk with failed fits in a filled bin, in an empty bin and only NaN
+   writeLog( fName, ["nll=nan, mu=0.6", "nll=nan, mu=2.5"], mode="a", mtime=2000 )
+   assert state.update( [fName] ) == 2
+   assert state.minNLL == 2.0
+   assert not np.isnan( state.minima ).any()
+   assert list( state.minima ) == [np.inf,3.0,2.0,np.inf,np.inf,np.inf]
+   assert not state.filled[3]
+
+   # the state stays clean after saving and loading
+   stateFile = str( tmpdir.join( "state.npz" ) )
+   state.save( stateFile )
+   state = helperScanState.load( stateFile )
+   writeLog( fName, ["nll=1.0, mu=2.5"], mode="a", mtime=3000 )
+   state.update( [fName] )
+   assert state.minNLL == 1.0
+   assert list( state.minima ) == [np.inf,3.0,2.0,1.0,np.inf,np.inf]
+
+def test_updateRepairsNaNState( tmpdir ):
+   # a state with NaN minima, as written before NaN values were skipped
+   fName = str( tmpdir.join( "scan.log" ) )
+   writeLog( fName, ["* POI mu=[4,0.0,4.0]", "nll=3.0, mu=0.5"], mtime=1000 )
+   state = helperScanState.ScanState()
+   state.update( [fName] )
+   state.minNLL = np.nan
+   state.minima[1] = np.nan
+
+   writeLog( fName, ["nll=1.0, mu=0.7"], mode="a", mtime=2000 )
+   state.update( [fName] )
+   assert state.minNLL == 1.0
+   assert state.minima[1] == 1.0
+
+def test_isValid( tmpdir ):
+   fName = str( tmpdir.join( "scan.log" ) )
+   writeLog( fName, ["* POI mu=[4,0.0,4.0]", "nll=3.0, mu=0.5"], mtime=1000 )
+   state = helperScanState.ScanState()
+   state.update( [fName] )
+   assert state.isValid( [fName] )
+   # rewritten with fewer bytes than were read
+   writeLog( fName, ["* POI"], mtime=2000 )
+   assert not state.isValid( [fName] )
+   assert not state.isValid( [] )
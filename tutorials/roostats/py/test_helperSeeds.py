@@ -0,0 +1,35 @@
+
+#  Created on: February 12, 2013
+
+__author__ = "Sven Kreiss, Kyle Cranmer"
+__version__ = "0.1"
+__doc__ = """
+Tests of helperSeeds.py. Run with: python -m pytest
+"""
+
+
+
+import helperSeeds
+
+
+class Options:
+   def __init__( self, seed=None ):
+      self.seed = seed
+
+
+def test_streamSeed():
+   assert helperSeeds.streamSeed( 1, 2 ) == 1731915440
+   assert helperSeeds.streamSeed( 1, "a", 3 ) == 3967486401
+   seeds = set( [ helperSeeds.streamSeed( 1, i ) for i in range( 100 ) ] )
+   assert len( seeds ) == 100
+   assert 0 not in seeds
+   assert helperSeeds.streamSeed( 1, 2 ) != helperSeeds.streamSeed( 2, 1 )
+
+def test_campaignSeed():
+   options = Options( 42 )
+   assert helperSeeds.campaignSeed( options ) == 42
+   options = Options()
+   seed = helperSeeds.campaignSeed( options )
+   assert seed is not None
+   assert options.seed == seed
+   assert helperSeeds.campaignSeed( options ) == seed